@@ -20,6 +20,8 @@ from .relation import Relation
 from .operation import Operation, Constant
 from .problem import Problem
 from .validation import validate
+from .benchmark import bench
+from .spec import enumerate_spec
 from .lexord import ORDDOM, ORDLEX, OrdCmp
 
 
@@ -187,6 +189,8 @@ def cli():
 
 
 cli.add_command(validate)
+cli.add_command(bench)
+cli.add_command(enumerate_spec)
 
 
 @cli.command()
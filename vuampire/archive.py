@@ -0,0 +1,192 @@
+# Copyright (C) 2024, Miklos Maroti
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import json
+import os
+import struct
+from typing import Any, Dict, Iterable, List, Optional
+from typeguard import typechecked
+import numpy as np
+
+from .domain import FixedDom
+from .problem import Problem
+
+MAGIC = b"VUAMPARC"
+VERSION = 1
+
+
+class ArchiveWriter:
+    """
+    Appends the models returned by yield_all_models to a binary archive.
+    The file starts with the magic bytes, the length of the header and
+    the header in JSON, listing the projected relations and operations
+    with their domains, arities and the offsets of their cells. Then
+    each model follows as a fixed width row of cells, one byte per cell
+    (two bytes if a domain has more than 256 elements).
+    """
+
+    @typechecked
+    def __init__(self, path: str, problem: Problem, names: List[str],
+                 flush_size: int = 1 << 20):
+        columns = []
+        offset = 0
+        itemsize = 1
+        for name in names:
+            if name in problem.relations:
+                obj, kind = problem.relations[name], "relation"
+            elif name in problem.operations:
+                obj, kind = problem.operations[name], "operation"
+                itemsize = max(itemsize, 1 if obj.domain.size <= 256 else 2)
+            else:
+                raise ValueError(f"unknown relation or operation {name}")
+            assert isinstance(obj.domain, FixedDom)
+            cells = obj.domain.size ** obj.arity
+            columns.append({
+                "name": name,
+                "kind": kind,
+                "domain": str(obj.domain),
+                "size": obj.domain.size,
+                "arity": obj.arity,
+                "offset": offset,
+                "cells": cells,
+            })
+            offset += cells
+
+        self.path = path
+        self.columns = columns
+        self.cells = offset
+        self.dtype = np.dtype("u1" if itemsize == 1 else "<u2")
+        self.flush_size = flush_size
+        self.buffer = bytearray()
+        self.count = 0
+
+        header = json.dumps({
+            "version": VERSION,
+            "columns": columns,
+            "cells": self.cells,
+            "dtype": self.dtype.str,
+        }).encode()
+        # pad so that the rows start at a multiple of 8 bytes
+        length = len(header) + (-len(MAGIC) - 4 - len(header)) % 8
+        self.file = open(path, "wb")
+        self.file.write(MAGIC + struct.pack("<I", length)
+                        + header.ljust(length))
+
+    @typechecked
+    def write(self, model: Dict[str, Any]):
+        row = np.empty(self.cells, dtype=self.dtype)
+        for column in self.columns:
+            start = column["offset"]
+            table = model[column["name"]]
+            if isinstance(table, (bytes, bytearray, memoryview)):
+                table = np.frombuffer(table, dtype=np.uint8)
+            row[start:start + column["cells"]] = table
+        self.buffer += row.tobytes()
+        self.count += 1
+        if len(self.buffer) >= self.flush_size:
+            self.flush()
+
+    @typechecked
+    def write_all(self, models: Iterable[Dict[str, Any]]) -> int:
+        for model in models:
+            self.write(model)
+        self.flush()
+        return self.count
+
+    def flush(self):
+        self.file.write(self.buffer)
+        self.file.flush()
+        self.buffer.clear()
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+    def __enter__(self) -> 'ArchiveWriter':
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class Archive:
+    """
+    A model archive opened for reading. The models attribute is a read
+    only memory mapped numpy array of shape (models, cells), and table
+    returns the cells of a single relation or operation with one axis
+    per argument. A truncated last row is ignored.
+    """
+
+    @typechecked
+    def __init__(self, path: str):
+        with open(path, "rb") as file:
+            magic = file.read(len(MAGIC))
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a model archive")
+            length, = struct.unpack("<I", file.read(4))
+            header = json.loads(file.read(length))
+        if header["version"] != VERSION:
+            raise ValueError(
+                f"unsupported archive version {header['version']}")
+
+        self.path = path
+        self.columns: Dict[str, Dict[str, Any]] = {
+            column["name"]: column for column in header["columns"]}
+        self.cells: int = header["cells"]
+        self.dtype = np.dtype(header["dtype"])
+
+        start = len(MAGIC) + 4 + length
+        width = self.cells * self.dtype.itemsize
+        count = (os.path.getsize(path) - start) // width if width else 0
+        if count == 0 or width == 0:
+            self.models = np.empty((count, self.cells), dtype=self.dtype)
+        else:
+            self.models = np.memmap(path, dtype=self.dtype, mode="r",
+                                    offset=start, shape=(count, self.cells))
+
+    @property
+    def names(self) -> List[str]:
+        return list(self.columns)
+
+    def __len__(self) -> int:
+        return self.models.shape[0]
+
+    @typechecked
+    def table(self, name: str, index: Optional[int] = None) -> np.ndarray:
+        column = self.columns[name]
+        start = column["offset"]
+        cells = self.models[:, start:start + column["cells"]]
+        if column["kind"] == "relation":
+            cells = cells.astype(bool)
+        shape = (column["size"], ) * column["arity"]
+        if index is None:
+            return cells.reshape((len(self), ) + shape)
+        return cells[index].reshape(shape)
+
+    @typechecked
+    def model(self, index: int) -> Dict[str, Any]:
+        # a single model in the format of yield_all_models
+        return {name: self.table(name, index).ravel().tolist()
+                for name in self.columns}
+
+
+@typechecked
+def archive_all_models(problem: Problem, path: str, names: List[str],
+                       **kwargs: Any) -> int:
+    # Streams the models of yield_all_models into a new archive, the
+    # keyword arguments are passed to yield_all_models.
+    with ArchiveWriter(path, problem, names) as writer:
+        return writer.write_all(problem.yield_all_models(names, **kwargs))
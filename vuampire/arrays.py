@@ -0,0 +1,170 @@
+# Copyright (C) 2024, Miklos Maroti
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import functools
+import re
+from typing import Any, Dict
+from typeguard import typechecked
+import numpy as np
+
+from .domain import Term, FixedDom, BOOLEAN, SYMBOL, EQ, NE, NOT, AND, OR, \
+    IMP, IFF, FORALL, EXISTS
+from .problem import Problem
+
+RE_VARIABLE = re.compile(r"^X(\d+)$")
+
+
+class ArrayModel:
+    """
+    A model of a problem over FixedDom domains whose tables are numpy
+    arrays with one axis per argument, boolean for relations and element
+    indices for operations. The result can be a full model or a projection
+    as returned by yield_all_models. Terms built with the library are
+    evaluated by broadcasting, the bound variable Xk of a quantifier is
+    the k-th axis.
+    """
+
+    @typechecked
+    def __init__(self, problem: Problem, result: Dict[str, Any]):
+        self.elements: Dict[str, int] = {}
+        for dom in problem.domains.values():
+            if isinstance(dom, FixedDom):
+                for idx, elem in enumerate(dom.elems):
+                    self.elements[str(elem)] = idx
+
+        self.tables: Dict[str, np.ndarray] = {}
+        for symbols in (problem.relations, problem.operations,
+                        problem.functions):
+            for name, fun in symbols.items():
+                if name in result:
+                    table = result[name]
+                elif name in result.get("predicates", {}):
+                    table = result["predicates"][name]["table"]
+                elif name in result.get("functions", {}):
+                    table = result["functions"][name]["table"]
+                else:
+                    continue
+
+                if any(v is None for v in table):
+                    raise ValueError(f"table of {name} is incomplete")
+                shape = []
+                for dom in fun.domains:
+                    if not isinstance(dom, FixedDom):
+                        raise ValueError(f"domain of {name} is not fixed")
+                    shape.append(dom.size)
+                dtype = bool if fun.codomain == BOOLEAN else np.intp
+                self.tables[name] = np.array(table, dtype=dtype).reshape(shape)
+
+    @typechecked
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.tables[name]
+
+    @staticmethod
+    def depth(term: Term) -> int:
+        # one more than the largest bound variable index
+        depth = 0
+        seen = set()
+        stack = [term]
+        while stack:
+            node = stack.pop()
+            if id(node) in seen:
+                continue
+            seen.add(id(node))
+            if node.op == SYMBOL and not node.args:
+                match = RE_VARIABLE.match(node.name)
+                if match:
+                    depth = max(depth, int(match.group(1)) + 1)
+            stack.extend(node.args)
+        return depth
+
+    def leaf(self, node: Term, depth: int) -> Any:
+        name = node.name
+        if name in self.elements:
+            return self.elements[name]
+        elif name in self.tables:
+            return self.tables[name][()]
+        elif name == "$true" or name == "$false":
+            return np.bool_(name == "$true")
+
+        match = RE_VARIABLE.match(name)
+        if not match or not isinstance(node.domain, FixedDom):
+            raise ValueError(f"cannot evaluate {name}")
+        axis = int(match.group(1))
+        shape = [1] * depth
+        shape[axis] = node.domain.size
+        return np.arange(node.domain.size).reshape(shape)
+
+    def apply(self, node: Term, args: list, depth: int) -> Any:
+        op = node.op
+        if op == SYMBOL:
+            if not args:
+                return self.leaf(node, depth)
+            elif node.name not in self.tables:
+                raise ValueError(f"no table for {node.name}")
+            return self.tables[node.name][tuple(args)]
+        elif op == EQ:
+            return np.equal(args[0], args[1])
+        elif op == NE:
+            return np.not_equal(args[0], args[1])
+        elif op == NOT:
+            return np.logical_not(args[0])
+        elif op == AND:
+            return functools.reduce(np.logical_and, args)
+        elif op == OR:
+            return functools.reduce(np.logical_or, args)
+        elif op == IMP:
+            return np.logical_or(np.logical_not(args[0]), args[1])
+        elif op == IFF:
+            return np.equal(args[0], args[1])
+
+        assert op == FORALL or op == EXISTS
+        body = np.asarray(args[-1])
+        if body.ndim == 0:
+            return body
+        axes = tuple(int(RE_VARIABLE.match(v.name).group(1))
+                     for v in node.args[:-1])
+        if op == FORALL:
+            return body.all(axis=axes, keepdims=True)
+        return body.any(axis=axes, keepdims=True)
+
+    @typechecked
+    def evaluate(self, term: Term) -> Any:
+        # Returns a boolean or element index for closed terms, otherwise
+        # an array indexed by the free variables.
+        depth = ArrayModel.depth(term)
+        values: Dict[int, Any] = {}
+        stack = [term]
+        while stack:
+            node = stack[-1]
+            if id(node) in values:
+                stack.pop()
+                continue
+            missing = [a for a in node.args if id(a) not in values]
+            if missing:
+                stack.extend(missing)
+                continue
+            stack.pop()
+            values[id(node)] = self.apply(
+                node, [values[id(a)] for a in node.args], depth)
+
+        value = np.asarray(values[id(term)])
+        if value.size == 1:
+            return value.item()
+        return value
+
+    @typechecked
+    def check(self, formula: Term) -> bool:
+        assert formula.domain == BOOLEAN
+        return bool(np.all(self.evaluate(formula)))
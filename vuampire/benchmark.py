@@ -0,0 +1,172 @@
+# Copyright (C) 2024, Miklos Maroti
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import click
+import contextlib
+import io
+import json
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .domain import FixedDom
+from .operation import Operation
+from .problem import Problem
+from .profile import Profile
+from .relation import Relation
+from .validation import check_equivalence_relations, check_partial_orders, \
+    check_semigroups, check_semilattices, check_petersen_automorphisms
+
+PHASES = ("build", "render", "solver", "parse")
+
+
+def construct_has_values(size: int):
+    prob = Problem()
+
+    dom = FixedDom("dom", size)
+    prob.declare(dom)
+
+    rel = Relation("rel", dom, 2)
+    prob.declare(rel)
+
+    table = [(i * 7 + j) % 3 == 0 for i in range(size) for j in range(size)]
+    prob.require(rel.has_values(table))
+
+
+def construct_compatible(arity: int, rel_arity: int):
+    prob = Problem()
+
+    dom = FixedDom("dom", 3)
+    prob.declare(dom)
+
+    rel = Relation("rel", dom, rel_arity)
+    prob.declare(rel)
+
+    op = Operation("op", dom, arity)
+    prob.declare(op)
+
+    for _ in range(10):
+        prob.require(op.is_compatible_with(rel))
+
+
+# name, function, arguments and whether it calls the solver
+CASES: List[Tuple[str, Callable[..., None], Tuple[int, ...], bool]] = [
+    ("equivalences-4", check_equivalence_relations, (4, 15), True),
+    ("equivalences-5", check_equivalence_relations, (5, 52), True),
+    ("equivalences-6", check_equivalence_relations, (6, 203), True),
+    ("partial-orders-3", check_partial_orders, (3, 19), True),
+    ("partial-orders-4", check_partial_orders, (4, 219), True),
+    ("semigroups-2", check_semigroups, (2, 8), True),
+    ("semigroups-3", check_semigroups, (3, 113), True),
+    ("semilattices-3", check_semilattices, (3, 9), True),
+    ("semilattices-4", check_semilattices, (4, 76), True),
+    ("petersen", check_petersen_automorphisms, (), True),
+    ("has-values-10", construct_has_values, (10, ), False),
+    ("has-values-30", construct_has_values, (30, ), False),
+    ("has-values-100", construct_has_values, (100, ), False),
+    ("compatible-2-3", construct_compatible, (2, 3), False),
+    ("compatible-3-3", construct_compatible, (3, 3), False),
+    ("compatible-4-4", construct_compatible, (4, 4), False),
+]
+
+
+def run_case(function: Callable[..., None], args: Tuple[int, ...],
+             solves: bool, jobs: int, backend: str) -> Dict[str, Any]:
+    options = {"jobs": jobs, "backend": backend} if solves else {}
+    profile = Profile()
+    Problem.profile = profile
+    try:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            with profile.phase("build"):
+                function(*args, **options)
+        total = time.perf_counter() - start
+    finally:
+        Problem.profile = None
+
+    result = {"total": total}
+    for phase in PHASES:
+        result[phase] = profile.times.get(phase, 0.0)
+    result["solver_calls"] = profile.solver_calls
+    result["input_bytes"] = profile.input_bytes
+    return result
+
+
+def print_table(results: Dict[str, Dict[str, Any]]):
+    print(f"{'case':<20}{'total':>9}" +
+          "".join(f"{p:>9}" for p in PHASES) + f"{'calls':>8}{'KiB':>10}")
+    for name, res in results.items():
+        print(f"{name:<20}{res['total']:9.3f}" +
+              "".join(f"{res[p]:9.3f}" for p in PHASES) +
+              f"{res['solver_calls']:8}{res['input_bytes'] / 1024:10.1f}")
+
+
+def compare(results: Dict[str, Dict[str, Any]],
+            baseline: Dict[str, Dict[str, Any]],
+            tolerance: float) -> List[str]:
+    slower = []
+    print(f"{'case':<20}{'baseline':>10}{'current':>10}{'ratio':>8}")
+    for name, res in results.items():
+        if name not in baseline:
+            continue
+        old = baseline[name]["total"]
+        ratio = res["total"] / old if old > 0.0 else 1.0
+        mark = ""
+        if ratio > 1.0 + tolerance:
+            mark = " slower"
+            slower.append(name)
+        elif ratio < 1.0 - tolerance:
+            mark = " faster"
+        print(f"{name:<20}{old:10.3f}{res['total']:10.3f}{ratio:8.2f}{mark}")
+    return slower
+
+
+@click.command()
+@click.option("--jobs", type=int, default=1,
+              help="Number of parallel solver calls, 0 for all cores.")
+@click.option("--backend", type=click.Choice(Problem.BACKENDS),
+              default="vampire", help="Model finder to use.")
+@click.option("--repeat", type=int, default=1,
+              help="Number of runs per case, the fastest one is kept.")
+@click.option("--case", "cases", multiple=True,
+              help="Run only the cases whose name starts with this.")
+@click.option("--output", type=click.Path(dir_okay=False),
+              help="Write the results to this JSON file.")
+@click.option("--baseline", type=click.Path(exists=True, dir_okay=False),
+              help="Compare the results with this JSON file.")
+@click.option("--tolerance", type=float, default=0.1,
+              help="Relative change of the total time that is reported.")
+def bench(jobs: int, backend: str, repeat: int, cases: Tuple[str, ...],
+          output: Optional[str], baseline: Optional[str], tolerance: float):
+    results = {}
+    for name, function, args, solves in CASES:
+        if cases and not any(name.startswith(c) for c in cases):
+            continue
+        runs = [run_case(function, args, solves, jobs, backend)
+                for _ in range(max(repeat, 1))]
+        results[name] = min(runs, key=lambda r: r["total"])
+    print_table(results)
+
+    if output is not None:
+        with open(output, "w") as file:
+            json.dump({"backend": backend, "jobs": jobs, "cases": results},
+                      file, indent=2)
+
+    if baseline is not None:
+        with open(baseline) as file:
+            old = json.load(file)
+        print()
+        slower = compare(results, old["cases"], tolerance)
+        if slower:
+            raise click.ClickException(f"slower cases: {', '.join(slower)}")
@@ -0,0 +1,191 @@
+# Copyright (C) 2024, Miklos Maroti
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from typing import Any, Iterator, List, Tuple
+from typeguard import typechecked
+import numpy as np
+
+
+class BitRelation:
+    """
+    A binary relation on a finite set packed into integers, where bit j
+    of row i is set if the pair (i, j) is in the relation. Composition,
+    transpose and the usual properties are computed with bit operations.
+    """
+
+    @typechecked
+    def __init__(self, size: int, rows: List[int]):
+        assert len(rows) == size
+        assert all(0 <= row < 1 << size for row in rows)
+        self.size = size
+        self.rows = tuple(rows)
+
+    @staticmethod
+    @typechecked
+    def from_table(size: int, table: List[bool]) -> 'BitRelation':
+        assert len(table) == size * size
+        rows = []
+        for i in range(size):
+            row = 0
+            for j in range(size):
+                if table[i * size + j]:
+                    row |= 1 << j
+            rows.append(row)
+        return BitRelation(size, rows)
+
+    @typechecked
+    def table(self) -> List[bool]:
+        return [bool(row >> j & 1) for row in self.rows
+                for j in range(self.size)]
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, BitRelation) and self.rows == other.rows
+
+    def __hash__(self) -> int:
+        return hash(self.rows)
+
+    def __repr__(self) -> str:
+        return f"BitRelation({self.size}, {list(self.rows)})"
+
+    @typechecked
+    def __contains__(self, pair: Tuple[int, int]) -> bool:
+        return bool(self.rows[pair[0]] >> pair[1] & 1)
+
+    @typechecked
+    def __and__(self, other: 'BitRelation') -> 'BitRelation':
+        assert self.size == other.size
+        return BitRelation(self.size, [a & b for a, b in
+                                       zip(self.rows, other.rows)])
+
+    @typechecked
+    def __or__(self, other: 'BitRelation') -> 'BitRelation':
+        assert self.size == other.size
+        return BitRelation(self.size, [a | b for a, b in
+                                       zip(self.rows, other.rows)])
+
+    @typechecked
+    def __le__(self, other: 'BitRelation') -> bool:
+        assert self.size == other.size
+        return all(a & ~b == 0 for a, b in zip(self.rows, other.rows))
+
+    @typechecked
+    def compose(self, other: 'BitRelation') -> 'BitRelation':
+        # the pairs (i, k) with (i, j) in self and (j, k) in other
+        assert self.size == other.size
+        rows = []
+        for row in self.rows:
+            result = 0
+            while row:
+                low = row & -row
+                result |= other.rows[low.bit_length() - 1]
+                row ^= low
+            rows.append(result)
+        return BitRelation(self.size, rows)
+
+    @typechecked
+    def transpose(self) -> 'BitRelation':
+        rows = [0] * self.size
+        for i, row in enumerate(self.rows):
+            for j in range(self.size):
+                if row >> j & 1:
+                    rows[j] |= 1 << i
+        return BitRelation(self.size, rows)
+
+    @typechecked
+    def is_reflexive(self) -> bool:
+        return all(row >> i & 1 for i, row in enumerate(self.rows))
+
+    @typechecked
+    def is_symmetric(self) -> bool:
+        return self == self.transpose()
+
+    @typechecked
+    def is_antisymmetric(self) -> bool:
+        return all(row & ~(1 << i) == 0 for i, row in
+                   enumerate((self & self.transpose()).rows))
+
+    @typechecked
+    def is_transitive(self) -> bool:
+        return self.compose(self) <= self
+
+
+# Batches of relations are numpy arrays of shape (count, size) with dtype
+# uint64, holding the rows of the relations as above.
+
+@typechecked
+def pack_tables(size: int, tables: Any) -> np.ndarray:
+    assert 0 <= size <= 64
+    tables = np.asarray(tables, dtype=bool).reshape(-1, size, size)
+    weights = np.left_shift(np.uint64(1), np.arange(size, dtype=np.uint64))
+    return np.bitwise_or.reduce(
+        np.where(tables, weights, np.uint64(0)), axis=2)
+
+
+@typechecked
+def unpack_tables(size: int, rows: np.ndarray) -> np.ndarray:
+    bits = np.right_shift(rows[:, :, None],
+                          np.arange(size, dtype=np.uint64)) & np.uint64(1)
+    return bits.astype(bool).reshape(rows.shape[0], size * size)
+
+
+@typechecked
+def compose_rows(size: int, rows1: np.ndarray,
+                 rows2: np.ndarray) -> np.ndarray:
+    result = np.zeros_like(rows1)
+    for j in range(size):
+        bit = np.right_shift(rows1, np.uint64(j)) & np.uint64(1)
+        result |= np.where(bit.astype(bool), rows2[:, j:j + 1], np.uint64(0))
+    return result
+
+
+@typechecked
+def transpose_rows(size: int, rows: np.ndarray) -> np.ndarray:
+    result = np.zeros_like(rows)
+    for i in range(size):
+        bits = np.right_shift(rows[:, i:i + 1], np.arange(
+            size, dtype=np.uint64)) & np.uint64(1)
+        result |= np.left_shift(bits, np.uint64(i))
+    return result
+
+
+@typechecked
+def transitive_rows(size: int, rows: np.ndarray) -> np.ndarray:
+    # a boolean mask selecting the transitive relations of the batch
+    square = compose_rows(size, rows, rows)
+    return np.all(square & ~rows == 0, axis=1)
+
+
+@typechecked
+def digraph_batches(size: int, reflexive: bool = True,
+                    batch_size: int = 4096) -> Iterator[np.ndarray]:
+    # Yields all digraphs in blocks, in the order of reflexive_digraphs
+    # where the off-diagonal cells are the digits of a binary counter.
+    assert batch_size > 0
+    cells = [(i, j) for i in range(size) for j in range(size)
+             if i != j or not reflexive]
+    assert len(cells) <= 63
+    diagonal = np.left_shift(np.uint64(1), np.arange(size, dtype=np.uint64))
+    if not reflexive:
+        diagonal[:] = 0
+
+    total = 1 << len(cells)
+    for start in range(0, total, batch_size):
+        codes = np.arange(start, min(start + batch_size, total),
+                          dtype=np.uint64)
+        rows = np.repeat(diagonal[None, :], len(codes), axis=0)
+        for idx, (i, j) in enumerate(cells):
+            bits = np.right_shift(codes, np.uint64(idx)) & np.uint64(1)
+            rows[:, i] |= np.left_shift(bits, np.uint64(j))
+        yield rows
@@ -0,0 +1,141 @@
+# Copyright (C) 2024, Miklos Maroti
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from typing import Dict, List, Optional, Tuple, TYPE_CHECKING
+from typeguard import typechecked
+
+from .domain import Term, BOOLEAN, AND, TRUE
+from .relation import Relation
+
+if TYPE_CHECKING:
+    from .problem import Problem
+
+
+class Node:
+    __slots__ = ("parent", "labels", "pred", "edges", "leaves")
+
+    def __init__(self, parent: Optional['Node'], labels: Tuple[Term, ...]):
+        self.parent = parent
+        # the claims along the edge from the parent
+        self.labels = labels
+        # nullary predicate implied by the claims on the path, if any
+        self.pred: Optional[Term] = None
+        # first claim -> child
+        self.edges: Dict[Term, Node] = {}
+        # number of blocked models below this node
+        self.leaves = 0
+
+
+class BlockingTrie:
+    """
+    Blocks the already found models of an enumeration with a compressed
+    trie of their cell claims. The guard of a node is the predicate of
+    its deepest ancestor that has one, followed by the claims below that
+    ancestor. A new model is blocked by a clause of the guard of the
+    deepest shared node and the remaining claims. A node gets a fresh
+    nullary predicate implied by its guard once the models already below
+    it would have paid for it, and from then on every clause below it
+    starts with that predicate instead of the shared prefix.
+    """
+
+    # approximate size in bytes of a predicate declaration and axiom
+    # without the name and the guard
+    OVERHEAD = 56
+    # how many times the clauses so far must have paid for a predicate
+    PAYBACK = 2
+
+    def __init__(self, problem: 'Problem'):
+        self.problem = problem
+        self.root = Node(None, ())
+
+    @staticmethod
+    @typechecked
+    def claims(formulas: List[Term]) -> List[Term]:
+        # the cell claims of the has_values formulas in order
+        result = []
+        for formula in formulas:
+            if formula.op == AND:
+                result.extend(formula.args)
+            elif formula is not TRUE:
+                result.append(formula)
+        return result
+
+    @staticmethod
+    def guard(node: Node) -> Tuple[Term, ...]:
+        parts = []
+        while node.pred is None and node.parent is not None:
+            parts.append(node.labels)
+            node = node.parent
+        guard = (node.pred, ) if node.pred is not None else ()
+        for labels in reversed(parts):
+            guard += labels
+        return guard
+
+    def shorten(self, node: Node):
+        # Adds a predicate to the node if the clauses below it so far
+        # would have been shorter by more than its cost.
+        guard = BlockingTrie.guard(node)
+        if len(guard) <= 1:
+            return
+        length = sum(len(str(claim)) + 3 for claim in guard)
+        name = f"block{len(self.problem.lines)}"
+        saving = length - len(name) - 3
+        cost = BlockingTrie.OVERHEAD + 3 * len(name) + length
+        if node.leaves * saving < BlockingTrie.PAYBACK * cost:
+            return
+        assert name not in self.problem.relations
+        rel = Relation(name, BOOLEAN, 0)
+        self.problem.declare(rel)
+        self.problem.require(Term.all(list(guard)).imp(rel()))
+        node.pred = rel()
+
+    @typechecked
+    def block(self, formulas: List[Term]):
+        claims = tuple(BlockingTrie.claims(formulas))
+        path = [self.root]
+        pos = 0
+        while True:
+            node = path[-1]
+            assert pos < len(claims), "model is already blocked"
+            child = node.edges.get(claims[pos])
+            if child is None:
+                break
+
+            labels = child.labels
+            common = 1
+            while common < len(labels) and \
+                    labels[common] is claims[pos + common]:
+                common += 1
+            if common < len(labels):
+                # split the edge, the old axioms still block the old child
+                middle = Node(node, labels[:common])
+                middle.edges[labels[common]] = child
+                middle.leaves = child.leaves
+                node.edges[claims[pos]] = middle
+                child.parent = middle
+                child.labels = labels[common:]
+                child = middle
+            assert child.edges, "model is already blocked"
+            path.append(child)
+            pos += common
+
+        node.edges[claims[pos]] = Node(node, claims[pos:])
+        for other in path:
+            other.leaves += 1
+        for other in path[1:]:
+            if other.pred is None:
+                self.shorten(other)
+        self.problem.require(~Term.all(
+            list(BlockingTrie.guard(node) + claims[pos:])))
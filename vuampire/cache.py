@@ -0,0 +1,131 @@
+# Copyright (C) 2024, Miklos Maroti
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import hashlib
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, Iterable, Optional
+from typeguard import typechecked
+
+
+class SolverCache:
+    """
+    Persistent cache of solver outputs in an sqlite database, keyed by the
+    hash of the solver binary, its options and the hash of the input. When
+    the compressed outputs exceed max_size bytes, then the least recently
+    used entries are evicted.
+    """
+
+    @typechecked
+    def __init__(self, path: str, max_size: int = 1 << 30):
+        self.path = path
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.connection = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key TEXT PRIMARY KEY, output BLOB, size INTEGER, accessed REAL)")
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS results_accessed ON results(accessed)")
+        # running total of the sizes, rescanned only when it is too large
+        self.size = self.total_size()
+
+    @staticmethod
+    @typechecked
+    def key(solver: str, options: Iterable[str], input_hash: str) -> str:
+        digest = hashlib.sha256()
+        digest.update(solver.encode())
+        for option in options:
+            digest.update(b"\0")
+            digest.update(option.encode())
+        digest.update(b"\0\0")
+        digest.update(input_hash.encode())
+        return digest.hexdigest()
+
+    @typechecked
+    def get(self, key: str) -> Optional[str]:
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT output FROM results WHERE key = ?", (key, )).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self.connection.execute(
+                "UPDATE results SET accessed = ? WHERE key = ?",
+                (time.time(), key))
+        return zlib.decompress(row[0]).decode()
+
+    def total_size(self) -> int:
+        return self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    @typechecked
+    def put(self, key: str, output: str):
+        data = zlib.compress(output.encode())
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT size FROM results WHERE key = ?", (key, )).fetchone()
+            self.connection.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                (key, data, len(data), time.time()))
+            self.size += len(data) - (row[0] if row is not None else 0)
+            if self.size > self.max_size:
+                self.evict(self.max_size)
+
+    def evict(self, max_size: int):
+        # other processes may share the database, so the total is exact
+        # only after a rescan
+        self.size = self.total_size()
+        while self.size > max_size:
+            row = self.connection.execute(
+                "SELECT key, size FROM results ORDER BY accessed LIMIT 1"
+            ).fetchone()
+            self.connection.execute(
+                "DELETE FROM results WHERE key = ?", (row[0], ))
+            self.size -= row[1]
+            self.evictions += 1
+
+    @typechecked
+    def clear(self):
+        with self.lock:
+            self.connection.execute("DELETE FROM results")
+            self.size = 0
+
+    @typechecked
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            entries, size = self.connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results"
+            ).fetchone()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": entries,
+            "size": size,
+        }
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
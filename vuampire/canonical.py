@@ -0,0 +1,171 @@
+# Copyright (C) 2024, Miklos Maroti
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import hashlib
+import itertools
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from typeguard import typechecked
+
+
+@lru_cache(maxsize=None)
+def coordinates(size: int, arity: int) -> List[Tuple[int, ...]]:
+    # The coordinates of the cells of a table in row major order.
+    return list(itertools.product(range(size), repeat=arity))
+
+
+class Canonizer:
+    """
+    Computes the canonical form of a finite structure given by relation
+    tables (of booleans) and operation tables (of element indices) over
+    the same domain. The ordered partition of the elements is refined by
+    counting how they appear in the tables, and the remaining ties are
+    broken by individualizing elements one by one. The canonical form is
+    the lexicographically smallest relabelled structure found at the
+    leaves of this search, subtrees equivalent under an already found
+    automorphism are skipped.
+    """
+
+    @typechecked
+    def __init__(self, size: int, tables: List[List[bool | int]]):
+        self.size = size
+        self.tables = []
+        for table in tables:
+            arity = 0
+            while size ** arity < len(table):
+                arity += 1
+            assert size ** arity == len(table)
+            is_op = len(table) > 0 and not isinstance(table[0], bool)
+            self.tables.append((arity, table, is_op))
+
+        self.best: Optional[Tuple] = None
+        self.best_labels: Optional[List[int]] = None
+        self.automorphisms: List[List[int]] = []
+
+    def refine(self, colors: List[int]) -> List[int]:
+        # Splits the color classes until the colors of the elements
+        # determine how many times they occur with given colors in the
+        # tables. The new colors are ranks of label independent signatures.
+        while True:
+            signatures = [[] for _ in range(self.size)]
+            for idx, (arity, table, is_op) in enumerate(self.tables):
+                for coord, value in zip(coordinates(self.size, arity), table):
+                    key = (idx, tuple(colors[x] for x in coord),
+                           colors[value] if is_op else value)
+                    for pos, x in enumerate(coord):
+                        signatures[x].append((pos, key))
+                    if is_op:
+                        signatures[value].append((-1, key))
+
+            signatures = [(colors[x], tuple(sorted(signatures[x])))
+                          for x in range(self.size)]
+            ranks = {sig: rank for rank, sig in
+                     enumerate(sorted(set(signatures)))}
+            new_colors = [ranks[sig] for sig in signatures]
+            if len(ranks) == len(set(colors)):
+                return new_colors
+            colors = new_colors
+
+    def relabel(self, labels: List[int]) -> Tuple:
+        # The tables of the isomorphic copy where element x becomes labels[x].
+        form = []
+        for arity, table, is_op in self.tables:
+            new_table = [None] * len(table)
+            for coord, value in zip(coordinates(self.size, arity), table):
+                idx = 0
+                for x in coord:
+                    idx = idx * self.size + labels[x]
+                new_table[idx] = labels[value] if is_op else value
+            form.append(tuple(new_table))
+        return tuple(form)
+
+    def orbits(self, fixed: List[int]) -> List[int]:
+        # Union-find representatives of the orbits of the automorphisms
+        # found so far that fix the given elements.
+        parent = list(range(self.size))
+
+        def find(x: int) -> int:
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+
+        for aut in self.automorphisms:
+            if all(aut[x] == x for x in fixed):
+                for x in range(self.size):
+                    a, b = find(x), find(aut[x])
+                    if a != b:
+                        parent[max(a, b)] = min(a, b)
+        return [find(x) for x in range(self.size)]
+
+    def search(self, colors: List[int], fixed: List[int]):
+        colors = self.refine(colors)
+
+        counts = [0] * self.size
+        for color in colors:
+            counts[color] += 1
+        target = next((c for c in range(self.size) if counts[c] > 1), None)
+
+        if target is None:
+            form = self.relabel(colors)
+            if self.best is None or form < self.best:
+                self.best = form
+                self.best_labels = colors
+            elif form == self.best:
+                inverse = [None] * self.size
+                for x, label in enumerate(self.best_labels):
+                    inverse[label] = x
+                self.automorphisms.append(
+                    [inverse[colors[x]] for x in range(self.size)])
+            return
+
+        tried = set()
+        for x in range(self.size):
+            if colors[x] != target:
+                continue
+            orbit = self.orbits(fixed)[x]
+            if orbit in tried:
+                continue
+            tried.add(orbit)
+
+            new_colors = [2 * c + (1 if c == target and y != x else 0)
+                          for y, c in enumerate(colors)]
+            self.search(new_colors, fixed + [x])
+
+    @typechecked
+    def canonical_form(self) -> Tuple:
+        if self.best is None:
+            self.search([0] * self.size, [])
+        return self.best
+
+
+@typechecked
+def canonical_form(size: int, tables: List[List[bool | int]]) -> Tuple:
+    return Canonizer(size, tables).canonical_form()
+
+
+@typechecked
+def unique_models(models: Iterable[Dict[str, List[Any]]],
+                  size: int) -> Iterator[Dict[str, List[Any]]]:
+    # Yields the first model of each isomorphism class, where the tables
+    # of all models are over the same domain of the given size. Only a
+    # digest of the canonical form is kept for each class.
+    seen = set()
+    for model in models:
+        form = canonical_form(size, [model[name] for name in sorted(model)])
+        digest = hashlib.blake2b(repr(form).encode(), digest_size=16).digest()
+        if digest not in seen:
+            seen.add(digest)
+            yield model
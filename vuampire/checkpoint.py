@@ -0,0 +1,154 @@
+# Copyright (C) 2024, Miklos Maroti
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import json
+import os
+import time
+from typing import Any, Dict, Iterator, List, Tuple
+from typeguard import typechecked
+
+from .domain import Term
+from .model import dump_model
+from .problem import Problem
+
+VERSION = 1
+
+
+class Checkpoint:
+    """
+    Saves the state of a yield_all_models enumeration, so that it can be
+    resumed after the process dies. The models are appended to a JSON
+    lines log at path.models as they are found, and at most every interval
+    seconds the log is synced and the header at path is replaced
+    atomically. The header records the hash of the problem before the
+    enumeration, the projected names and the number of models so far.
+    """
+
+    @typechecked
+    def __init__(self, path: str, interval: float = 5.0):
+        self.path = path
+        self.log_path = path + ".models"
+        self.interval = interval
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    @typechecked
+    def header(self) -> Dict[str, Any]:
+        with open(self.path) as file:
+            header = json.load(file)
+        if header["version"] != VERSION:
+            raise ValueError(
+                f"unsupported checkpoint version {header['version']}")
+        return header
+
+    @typechecked
+    def models(self) -> List[Dict[str, Any]]:
+        return self.read_log()[0]
+
+    def read_log(self) -> Tuple[List[Dict[str, Any]], int]:
+        # The models of the complete lines and their length in bytes, a
+        # partially written last line is dropped.
+        models = []
+        length = 0
+        if os.path.exists(self.log_path):
+            with open(self.log_path, "rb") as file:
+                for line in file:
+                    if not line.endswith(b"\n"):
+                        break
+                    models.append(json.loads(line))
+                    length += len(line)
+        return models, length
+
+    def save(self, header: Dict[str, Any], log: Any):
+        log.flush()
+        os.fsync(log.fileno())
+        with open(self.path + ".tmp", "w") as file:
+            json.dump(header, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(self.path + ".tmp", self.path)
+
+    @typechecked
+    def start(self, problem: Problem, names: List[str],
+              **kwargs: Any) -> Iterator[Dict[str, Any]]:
+        # Starts a new enumeration, the keyword arguments are passed to
+        # yield_all_models.
+        header = {
+            "version": VERSION,
+            "digest": problem.digest.hexdigest(),
+            "names": names,
+            "models": 0,
+            "complete": False,
+        }
+        with open(self.log_path, "w") as log:
+            self.save(header, log)
+        return self.run(problem, header, **kwargs)
+
+    @typechecked
+    def resume(self, problem: Problem,
+               **kwargs: Any) -> Iterator[Dict[str, Any]]:
+        # Continues the enumeration of the same problem, yielding only the
+        # models not found before. The problem must be in the state in
+        # which the enumeration was started.
+        header = self.header()
+        if header["digest"] != problem.digest.hexdigest():
+            raise ValueError("checkpoint is for a different problem")
+
+        models, length = self.read_log()
+        with open(self.log_path, "r+b") as log:
+            log.truncate(length)
+
+        names = header["names"]
+        for model in models:
+            problem.require(~Term.all(
+                [problem.has_values(name, model[name]) for name in names]))
+
+        header["models"] = len(models)
+        if header["complete"]:
+            return iter(())
+        return self.run(problem, header, **kwargs)
+
+    def run(self, problem: Problem, header: Dict[str, Any],
+            **kwargs: Any) -> Iterator[Dict[str, Any]]:
+        budget = kwargs.get("budget")
+        with open(self.log_path, "a") as log:
+            last = time.monotonic()
+            try:
+                for model in problem.yield_all_models(
+                        header["names"], **kwargs):
+                    log.write(dump_model(model) + "\n")
+                    header["models"] += 1
+                    if time.monotonic() - last >= self.interval:
+                        self.save(header, log)
+                        last = time.monotonic()
+                    yield model
+                header["complete"] = budget is None or not budget.exhausted
+            finally:
+                self.save(header, log)
+
+
+@typechecked
+def checkpointed_models(problem: Problem, names: List[str], path: str,
+                        interval: float = 5.0,
+                        **kwargs: Any) -> Iterator[Dict[str, Any]]:
+    # Resumes the enumeration if there is a checkpoint at path, otherwise
+    # starts a new one.
+    checkpoint = Checkpoint(path, interval)
+    if checkpoint.exists():
+        if checkpoint.header()["names"] != names:
+            raise ValueError("checkpoint has different names")
+        return checkpoint.resume(problem, **kwargs)
+    return checkpoint.start(problem, names, **kwargs)
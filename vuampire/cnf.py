@@ -0,0 +1,410 @@
+# Copyright (C) 2024, Miklos Maroti
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import itertools
+import math
+import subprocess
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, \
+    TYPE_CHECKING
+from typeguard import typechecked
+
+from .engine import Engine, CONST, CELL, APP, EQ, NOT, AND, OR, IFF
+from .limits import Budget, ResourceOut, kill_process, wait_process
+
+if TYPE_CHECKING:
+    from .problem import Problem
+
+
+class SatSolver:
+    """
+    Runs a SAT solver binary that reads DIMACS from its standard input and
+    prints the answer in the SAT competition format. The clauses are kept
+    encoded, so clauses added between calls cost only their own size.
+    """
+
+    COMMAND = ("kissat", "-q")
+
+    @typechecked
+    def __init__(self, command: Optional[Sequence[str]] = None,
+                 budget: Optional[Budget] = None):
+        self.command = tuple(command or SatSolver.COMMAND)
+        self.budget = budget
+        self.num_vars = 0
+        self.num_clauses = 0
+        self.data = bytearray()
+
+    def add_clause(self, clause: List[int]):
+        for lit in clause:
+            self.num_vars = max(self.num_vars, abs(lit))
+        self.num_clauses += 1
+        self.data += (" ".join(map(str, clause)) + " 0\n").encode()
+
+    def solve(self) -> Optional[List[int]]:
+        # Returns the literals of a satisfying assignment or None.
+        budget = self.budget
+        if budget is not None and budget.exhausted:
+            raise ResourceOut("budget exhausted")
+
+        process = subprocess.Popen(
+            args=self.command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+        usage = None
+        try:
+            if budget is not None:
+                budget.register(process)
+
+            try:
+                header = f"p cnf {self.num_vars} {self.num_clauses}\n"
+                process.stdin.write(header.encode())
+                with memoryview(self.data) as data:
+                    process.stdin.write(data)
+                process.stdin.close()
+            except BrokenPipeError:
+                pass
+
+            status = None
+            model = []
+            for line in process.stdout:
+                if line.startswith(b"s "):
+                    status = line[2:].strip().decode()
+                elif line.startswith(b"v "):
+                    model.extend(int(lit) for lit in line[2:].split())
+
+            usage = wait_process(process, budget)
+            if budget is not None:
+                stopped = budget.unregister(
+                    process, usage.ru_utime + usage.ru_stime)
+                budget = None
+                if stopped:
+                    raise ResourceOut("solver stopped by budget")
+            if status == "SATISFIABLE":
+                return [lit for lit in model if lit != 0]
+            elif status == "UNSATISFIABLE":
+                return None
+            elif status == "UNKNOWN":
+                raise ResourceOut("solver gave up")
+            raise RuntimeError(f"failed with {process.returncode} error code")
+        finally:
+            if usage is None:
+                kill_process(process)
+                usage = wait_process(process, budget)
+            if budget is not None:
+                budget.unregister(process, usage.ru_utime + usage.ru_stime)
+            process.stdout.close()
+
+
+class PySatSolver:
+    """
+    Incremental SAT solver from the optional python-sat package. The CPU
+    time of the calling thread is charged to the budget.
+    """
+
+    NAME = "cadical153"
+    # cadical ignores interrupts, so this is used when there is a budget
+    INTERRUPTIBLE = "glucose4"
+
+    @typechecked
+    def __init__(self, name: Optional[str] = None,
+                 budget: Optional[Budget] = None):
+        from pysat.solvers import Solver
+        if name is None:
+            name = PySatSolver.NAME if budget is None \
+                else PySatSolver.INTERRUPTIBLE
+        self.solver = Solver(name=name)
+        self.budget = budget
+
+    def add_clause(self, clause: List[int]):
+        self.solver.add_clause(clause)
+
+    def solve(self) -> Optional[List[int]]:
+        budget = self.budget
+        if budget is None:
+            result = self.solver.solve()
+            return self.solver.get_model() if result else None
+
+        budget.add_hook(self.solver.interrupt)
+        try:
+            while True:
+                if budget.exhausted:
+                    raise ResourceOut("budget exhausted")
+                # the thread cannot use more CPU time than wall time, so
+                # it is interrupted at the latest when either runs out
+                limits = [limit for limit in (budget.remaining_wall_time(),
+                                              budget.remaining_cpu_time())
+                          if limit is not None]
+                timer = None
+                if limits:
+                    timer = threading.Timer(min(limits),
+                                            self.solver.interrupt)
+                    timer.daemon = True
+                    timer.start()
+                start = time.thread_time()
+                try:
+                    result = self.solver.solve_limited(expect_interrupt=True)
+                finally:
+                    budget.charge(time.thread_time() - start)
+                    if timer is not None:
+                        timer.cancel()
+                    self.solver.clear_interrupt()
+                if result is not None:
+                    return self.solver.get_model() if result else None
+                if timer is None:
+                    raise ResourceOut("solver stopped by budget")
+        finally:
+            budget.remove_hook(self.solver.interrupt)
+
+
+@typechecked
+def sat_solver(budget: Optional[Budget] = None) -> SatSolver | PySatSolver:
+    # Uses the python-sat package if it is installed, otherwise the
+    # binary of SatSolver.COMMAND.
+    try:
+        return PySatSolver(budget=budget)
+    except ImportError:
+        return SatSolver(budget=budget)
+
+
+class Cnf:
+    """
+    Compiles a problem where every domain is a FixedDom to clauses. The
+    ground constraints come from the Engine, boolean cells are variables,
+    and the value of a cell of an operation is given by one variable per
+    element (onehot) or by the variables value >= k (order). Subformulas
+    get Tseitin variables, identical conjunctions are shared. Models are
+    enumerated by adding blocking clauses to the same solver.
+    """
+
+    ENCODINGS = ("onehot", "order")
+
+    def __init__(self, problem: 'Problem', encoding: str = "onehot",
+                 solver: Optional[SatSolver | PySatSolver] = None,
+                 budget: Optional[Budget] = None):
+        assert encoding in Cnf.ENCODINGS
+        self.engine = Engine(problem, budget=budget)
+        self.encoding = encoding
+        self.solver = solver
+        self.budget = budget
+        self.num_vars = 0
+        self.clauses: List[List[int]] = []
+        self.sent = 0
+        self.conjunctions: Dict[Tuple[int, ...], int] = {}
+
+        self.true = self.new_var()
+        self.clauses.append([self.true])
+
+        # boolean cells have a literal, other cells a list of literals
+        self.cells: List[Any] = [None] * self.engine.num_cells
+        for name in self.engine.names:
+            start, sizes, codomain = self.engine.symbols[name]
+            for cell in range(start, start + math.prod(sizes)):
+                if codomain is None:
+                    self.cells[cell] = self.new_var()
+                else:
+                    size = self.engine.domains[codomain].size
+                    self.cells[cell] = self.encode_value(size)
+
+        for expr in self.engine.constraints:
+            self.require(expr)
+
+    def new_var(self) -> int:
+        self.num_vars += 1
+        return self.num_vars
+
+    def encode_value(self, size: int) -> List[int]:
+        # Returns the literals of value == k for all k < size.
+        if size == 1:
+            return [self.true]
+        elif self.encoding == "onehot":
+            lits = [self.new_var() for _ in range(size)]
+            self.clauses.append(list(lits))
+            for a, b in itertools.combinations(lits, 2):
+                self.clauses.append([-a, -b])
+            return lits
+
+        # ge[k] is value >= k + 1
+        ge = [self.new_var() for _ in range(size - 1)]
+        for a, b in zip(ge, ge[1:]):
+            self.clauses.append([-b, a])
+        return [-ge[0]] + [self.conjunction([a, -b])
+                           for a, b in zip(ge, ge[1:])] + [ge[-1]]
+
+    def conjunction(self, lits: List[int]) -> int:
+        args = set()
+        for lit in lits:
+            if lit == -self.true or -lit in args:
+                return -self.true
+            elif lit != self.true:
+                args.add(lit)
+        if not args:
+            return self.true
+        elif len(args) == 1:
+            return args.pop()
+
+        key = tuple(sorted(args))
+        var = self.conjunctions.get(key)
+        if var is None:
+            var = self.new_var()
+            self.conjunctions[key] = var
+            for lit in key:
+                self.clauses.append([-var, lit])
+            self.clauses.append([var] + [-lit for lit in key])
+        return var
+
+    def disjunction(self, lits: List[int]) -> int:
+        return -self.conjunction([-lit for lit in lits])
+
+    def values(self, expr: Tuple) -> Dict[int, int]:
+        # Returns the literals of expr == k for the possible values k.
+        tag = expr[0]
+        if tag == CONST:
+            return {expr[1]: self.true}
+        elif tag == CELL:
+            return dict(enumerate(self.cells[expr[1]]))
+        assert tag == APP
+
+        cases: Dict[int, List[int]] = {}
+        for cell, cond in self.applications(expr):
+            for val, lit in enumerate(self.cells[cell]):
+                cases.setdefault(val, []).append(
+                    self.conjunction([cond, lit]))
+        return {val: self.disjunction(lits) for val, lits in cases.items()}
+
+    def applications(self, expr: Tuple) -> Iterator[Tuple[int, int]]:
+        # Yields the possible cells of the application together with the
+        # literal that selects them.
+        _, start, sizes, args = expr
+        for choice in itertools.product(
+                *[self.values(arg).items() for arg in args]):
+            idx = 0
+            for (val, _), size in zip(choice, sizes):
+                idx = idx * size + val
+            yield start + idx, self.conjunction([lit for _, lit in choice])
+
+    def literal(self, expr: Tuple) -> int:
+        tag = expr[0]
+        if tag == CONST:
+            return self.true if expr[1] else -self.true
+        elif tag == CELL:
+            return self.cells[expr[1]]
+        elif tag == NOT:
+            return -self.literal(expr[1])
+        elif tag == AND:
+            return self.conjunction([self.literal(a) for a in expr[1]])
+        elif tag == OR:
+            return self.disjunction([self.literal(a) for a in expr[1]])
+        elif tag == IFF:
+            a = self.literal(expr[1])
+            b = self.literal(expr[2])
+            return self.disjunction([self.conjunction([a, b]),
+                                     self.conjunction([-a, -b])])
+        elif tag == EQ:
+            left = self.values(expr[1])
+            right = self.values(expr[2])
+            return self.disjunction([
+                self.conjunction([lit, right[val]])
+                for val, lit in left.items() if val in right])
+        elif tag == APP:
+            return self.disjunction([
+                self.conjunction([cond, self.cells[cell]])
+                for cell, cond in self.applications(expr)])
+        raise ValueError(f"unexpected {tag}")
+
+    def require(self, expr: Tuple):
+        if expr[0] == AND:
+            for arg in expr[1]:
+                self.require(arg)
+        elif expr[0] == OR:
+            self.clauses.append([self.literal(a) for a in expr[1]])
+        else:
+            self.clauses.append([self.literal(expr)])
+
+    @typechecked
+    def dimacs(self) -> str:
+        lines = [f"p cnf {self.num_vars} {len(self.clauses)}"]
+        for clause in self.clauses:
+            lines.append(" ".join(map(str, clause)) + " 0")
+        return "\n".join(lines) + "\n"
+
+    def decode(self, model: List[int]):
+        # Stores the values of the cells in the engine.
+        true = set(lit for lit in model if lit > 0)
+        for cell, lits in enumerate(self.cells):
+            if isinstance(lits, int):
+                self.engine.values[cell] = lits in true
+            else:
+                self.engine.values[cell] = next(
+                    val for val, lit in enumerate(lits)
+                    if (lit in true if lit > 0 else -lit not in true))
+
+    def blocking_clause(self, names: List[str]) -> List[int]:
+        clause = []
+        for name in names:
+            start, sizes, _ = self.engine.symbols[name]
+            for cell in range(start, start + math.prod(sizes)):
+                lits = self.cells[cell]
+                value = self.engine.values[cell]
+                if isinstance(lits, int):
+                    clause.append(-lits if value else lits)
+                else:
+                    clause.append(-lits[value])
+        return clause
+
+    def start(self) -> SatSolver | PySatSolver:
+        if self.solver is None:
+            self.solver = sat_solver(budget=self.budget)
+        for clause in self.clauses[self.sent:]:
+            self.solver.add_clause(clause)
+        self.sent = len(self.clauses)
+        return self.solver
+
+    def solve(self, solver: SatSolver | PySatSolver) -> Optional[List[int]]:
+        # The encoding is charged by the engine, the solver charges itself.
+        self.engine.spend()
+        model = solver.solve()
+        self.engine.clock = time.thread_time()
+        return model
+
+    @typechecked
+    def find_one_model(self) -> Optional[Dict[str, Any]]:
+        model = self.solve(self.start())
+        if model is None:
+            return None
+        self.decode(model)
+        return self.engine.model()
+
+    @typechecked
+    def yield_all_models(self, names: List[str]) -> Iterator[Dict[str, Any]]:
+        solver = self.start()
+        while True:
+            model = self.solve(solver)
+            if model is None:
+                return
+            self.decode(model)
+            result = {name: self.engine.table(name) for name in names}
+            self.engine.spend()
+            yield result
+            self.engine.clock = time.thread_time()
+
+            clause = self.blocking_clause(names)
+            if not clause:
+                return
+            self.clauses.append(clause)
+            solver = self.start()
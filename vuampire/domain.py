@@ -14,98 +14,193 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 from abc import ABC, abstractmethod
-from typing import Iterator, Callable, List, Optional
+from contextvars import ContextVar
+import threading
+from typing import Iterator, Callable, List, Optional, Tuple, Union
 from typeguard import typechecked
+import weakref
+
+SYMBOL = ""
+EQ = "="
+NE = "!="
+NOT = "~"
+AND = "&"
+OR = "|"
+IMP = "=>"
+IFF = "<=>"
+FORALL = "!"
+EXISTS = "?"
 
 
 class Term:
+    # Terms are immutable and interned, so structurally equal terms are
+    # the same object and can be compared with is. The text is produced
+    # only when the term is rendered.
+    __slots__ = ("domain", "op", "name", "args", "__weakref__")
+
+    table: 'weakref.WeakValueDictionary[tuple, Term]' = \
+        weakref.WeakValueDictionary()
+    lock = threading.Lock()
+
+    def __new__(cls, domain: 'Domain', name: str) -> 'Term':
+        return Term.make(SYMBOL, domain, name, ())
+
+    @staticmethod
+    def make(op: str, domain: 'Domain', name: str,
+             args: Tuple['Term', ...]) -> 'Term':
+        key = (op, name, id(domain), tuple(id(a) for a in args))
+        with Term.lock:
+            term = Term.table.get(key)
+            if term is None:
+                term = object.__new__(Term)
+                term.domain = domain
+                term.op = op
+                term.name = name
+                term.args = args
+                Term.table[key] = term
+        return term
+
+    @staticmethod
+    @typechecked
+    def apply(domain: 'Domain', name: str, args: List['Term']) -> 'Term':
+        return Term.make(SYMBOL, domain, name, tuple(args))
+
+    __hash__ = object.__hash__
+
+    def pieces(self) -> List[Union[str, 'Term']]:
+        op, args = self.op, self.args
+        if op == SYMBOL:
+            if not args:
+                return [self.name]
+            result: List[Union[str, Term]] = [self.name, "("]
+            for arg in args:
+                result.append(arg)
+                result.append(",")
+            result[-1] = ")"
+            return result
+        elif op == EQ or op == NE:
+            return [args[0], f" {op} ", args[1]]
+        elif op == NOT:
+            return [NOT, args[0]]
+        elif op == FORALL or op == EXISTS:
+            vars = ",".join(f"{a.name}:{a.domain}" for a in args[:-1])
+            return ["(", f"{op}[{vars}]: ", args[-1], ")"]
+        else:
+            result = ["("]
+            for arg in args:
+                result.append(arg)
+                result.append(f" {op} ")
+            result[-1] = ")"
+            return result
+
     @typechecked
-    def __init__(self, domain: 'Domain', value: str):
-        self.domain = domain
-        self.value = value
+    def render(self, top: bool = False) -> str:
+        # iterative, because nested formulas can be very deep
+        out = []
+        stack = self.pieces()
+        if top and self.op not in (SYMBOL, EQ, NE, NOT):
+            stack = stack[1:-1]
+        stack.reverse()
+        while stack:
+            item = stack.pop()
+            if isinstance(item, str):
+                out.append(item)
+            elif item.op == SYMBOL and not item.args:
+                out.append(item.name)
+            else:
+                stack.extend(reversed(item.pieces()))
+        return "".join(out)
 
     @typechecked
     def __str__(self) -> str:
-        return self.value
+        return self.render()
+
+    @property
+    def value(self) -> str:
+        return self.render()
 
     @typechecked
     def __eq__(self, other: 'Term') -> 'Term':
         assert self.domain == other.domain
-        return Term(BOOLEAN, f"{self} = {other}")
+        if self is other:
+            return TRUE
+        return Term.make(EQ, BOOLEAN, "", (self, other))
 
     @typechecked
     def __ne__(self, other: 'Term') -> 'Term':
         assert self.domain == other.domain
-        return Term(BOOLEAN, f"{self} != {other}")
+        if self is other:
+            return FALSE
+        return Term.make(NE, BOOLEAN, "", (self, other))
 
     @typechecked
     def __and__(self, other: 'Term') -> 'Term':
-        assert self.domain == BOOLEAN and other.domain == BOOLEAN
-        if self.value == "$false" or other.value == "$true":
-            return self
-        elif self.value == "$true" or other.value == "$false":
-            return other
-        else:
-            return Term(BOOLEAN, f"({self} & {other})")
+        return Term.all([self, other])
 
     @typechecked
     def __or__(self, other: 'Term') -> 'Term':
-        assert self.domain == BOOLEAN and other.domain == BOOLEAN
-        if self.value == "$false" or other.value == "$true":
-            return other
-        elif self.value == "$true" or other.value == "$false":
-            return self
-        else:
-            return Term(BOOLEAN, f"({self} | {other})")
+        return Term.any([self, other])
 
     @typechecked
     def __invert__(self) -> 'Term':
         assert self.domain == BOOLEAN
-        if self.value == "$true":
-            return Term(BOOLEAN, "$false")
-        elif self.value == "$false":
-            return Term(BOOLEAN, "$true")
-        elif self.value.startswith("~"):
-            return Term(BOOLEAN, self.value[1:])
+        if self is TRUE:
+            return FALSE
+        elif self is FALSE:
+            return TRUE
+        elif self.op == NOT:
+            return self.args[0]
         else:
-            return Term(BOOLEAN, f"~{self.value}")
+            return Term.make(NOT, BOOLEAN, "", (self, ))
 
     @typechecked
     def imp(self, other: 'Term') -> 'Term':
         assert self.domain == BOOLEAN and other.domain == BOOLEAN
-        return Term(BOOLEAN, f"({self} => {other})")
+        if self is TRUE or other is TRUE or self is FALSE:
+            return ~self | other
+        return Term.make(IMP, BOOLEAN, "", (self, other))
+
+    @typechecked
+    def iff(self, other: 'Term') -> 'Term':
+        assert self.domain == BOOLEAN and other.domain == BOOLEAN
+        if self is other:
+            return TRUE
+        return Term.make(IFF, BOOLEAN, "", (self, other))
+
+    @staticmethod
+    def connect(op: str, unit: 'Term', zero: 'Term',
+                terms: List['Term']) -> 'Term':
+        args = []
+        for term in terms:
+            assert term.domain == BOOLEAN
+            if term is zero:
+                return zero
+            elif term.op == op:
+                args.extend(term.args)
+            elif term is not unit:
+                args.append(term)
+        if len(args) == 0:
+            return unit
+        elif len(args) == 1:
+            return args[0]
+        else:
+            return Term.make(op, BOOLEAN, "", tuple(args))
 
     @staticmethod
     @typechecked
     def any(terms: List['Term']) -> 'Term':
-        assert all(t.domain == BOOLEAN for t in terms)
-        terms = [t for t in terms if t.value != "$false"]
-        if len(terms) == 0:
-            return Term(BOOLEAN, '$false')
-        elif len(terms) == 1:
-            return terms[0]
-        elif any(t.value == "$true" for t in terms):
-            return Term(BOOLEAN, "$true")
-        else:
-            return Term(BOOLEAN, "(" + " | ".join(str(t) for t in terms) + ")")
+        return Term.connect(OR, FALSE, TRUE, terms)
 
     @staticmethod
     @typechecked
     def all(terms: List['Term']) -> 'Term':
-        assert all(t.domain == BOOLEAN for t in terms)
-        terms = [t for t in terms if t.value != "$true"]
-        if len(terms) == 0:
-            return Term(BOOLEAN, '$true')
-        elif len(terms) == 1:
-            return terms[0]
-        elif any(t.value == "$false" for t in terms):
-            return Term(BOOLEAN, "$false")
-        else:
-            return Term(BOOLEAN, "(" + " & ".join(str(t) for t in terms) + ")")
+        return Term.connect(AND, TRUE, FALSE, terms)
 
 
 class Domain(ABC):
-    nesting: int = 0
+    # The number of enclosing bound variables, which is local to each
+    # thread and asyncio task, so formulas can be built concurrently.
+    nesting: ContextVar[int] = ContextVar("nesting", default=0)
 
     @typechecked
     @abstractmethod
@@ -117,37 +212,31 @@ class Domain(ABC):
     def declare(self) -> Iterator[str]:
         raise NotImplementedError()
 
-    @typechecked
-    def forall(self, callable: Callable[..., Term],
-               num_args: Optional[int] = None) -> Term:
+    def quantify(self, op: str, callable: Callable[..., Term],
+                 num_args: Optional[int]) -> Term:
         if num_args is None:
             num_args = callable.__code__.co_argcount
-        args = [Term(self, f"X{Domain.nesting + i}")
-                for i in range(num_args)]
+        nesting = Domain.nesting.get()
+        args = [Term(self, f"X{nesting + i}") for i in range(num_args)]
 
-        Domain.nesting += num_args
-        result = callable(*args)
-        Domain.nesting -= num_args
+        token = Domain.nesting.set(nesting + num_args)
+        try:
+            result = callable(*args)
+        finally:
+            Domain.nesting.reset(token)
 
         assert result.domain == BOOLEAN
-        args = [f"{arg}:{self}" for arg in args]
-        return Term(BOOLEAN, f"(![{','.join(args)}]: {result})")
+        return Term.make(op, BOOLEAN, "", tuple(args) + (result, ))
 
     @typechecked
-    def exists(self, callable: Callable[..., Term],
+    def forall(self, callable: Callable[..., Term],
                num_args: Optional[int] = None) -> Term:
-        if num_args is None:
-            num_args = callable.__code__.co_argcount
-        args = [Term(self, f"X{Domain.nesting + i}")
-                for i in range(num_args)]
+        return self.quantify(FORALL, callable, num_args)
 
-        Domain.nesting += num_args
-        result = callable(*args)
-        Domain.nesting -= num_args
-
-        assert result.domain == BOOLEAN
-        args = [f"{arg}:{self}" for arg in args]
-        return Term(BOOLEAN, f"(?[{','.join(args)}]: {result})")
+    @typechecked
+    def exists(self, callable: Callable[..., Term],
+               num_args: Optional[int] = None) -> Term:
+        return self.quantify(EXISTS, callable, num_args)
 
 
 class PrimitiveDom(Domain):
@@ -169,6 +258,9 @@ UNIVERSE = PrimitiveDom("$i")
 BOOLEAN = PrimitiveDom("$o")
 INTEGER = PrimitiveDom("$int")
 
+TRUE = Term(BOOLEAN, "$true")
+FALSE = Term(BOOLEAN, "$false")
+
 
 class NamedDom(Domain):
     @typechecked
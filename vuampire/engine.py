@@ -0,0 +1,680 @@
+# Copyright (C) 2024, Miklos Maroti
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import re
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple, TYPE_CHECKING
+from typeguard import typechecked
+
+from .domain import FixedDom, BOOLEAN
+from .limits import Budget, ResourceOut
+
+if TYPE_CHECKING:
+    from .problem import Problem
+
+# Parsed formulas and ground expressions are nested tuples whose first
+# element is one of the following tags.
+CONST = "const"
+VAR = "var"
+APP = "app"
+CELL = "cell"
+EQ = "eq"
+NOT = "not"
+AND = "and"
+OR = "or"
+IMP = "imp"
+IFF = "iff"
+DISTINCT = "distinct"
+FORALL = "forall"
+EXISTS = "exists"
+
+
+class Parser:
+    """
+    Recursive descent parser for the fragment of TFF that the library
+    emits: quantifiers, the usual connectives, equality, $distinct and
+    applications of declared symbols.
+    """
+
+    RE_TOKEN = re.compile(r"\s*(<=>|<~>|=>|<=|~\||~&|!=|[()\[\],:!?~&|=]"
+                          r"|\$?[A-Za-z0-9_]+)")
+    RE_STATEMENT = re.compile(
+        r"^tff\(([\w\s]*),([\w\s]*),(.*)\)\.$", flags=re.DOTALL)
+
+    @typechecked
+    def __init__(self, text: str):
+        self.tokens = []
+        pos = 0
+        text = text.rstrip()
+        while pos < len(text):
+            match = Parser.RE_TOKEN.match(text, pos)
+            if not match:
+                raise ValueError(f"cannot parse {text[pos:]!r}")
+            self.tokens.append(match.group(1))
+            pos = match.end()
+        self.pos = 0
+
+    def peek(self) -> Optional[str]:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def next(self) -> str:
+        token = self.peek()
+        if token is None:
+            raise ValueError("unexpected end of formula")
+        self.pos += 1
+        return token
+
+    def expect(self, token: str):
+        if self.next() != token:
+            raise ValueError(f"expected {token!r} in formula")
+
+    def parse(self) -> Tuple:
+        formula = self.formula()
+        if self.peek() is not None:
+            raise ValueError(f"unexpected {self.peek()!r} in formula")
+        return formula
+
+    def formula(self) -> Tuple:
+        left = self.unit()
+        token = self.peek()
+        if token in ("&", "|"):
+            args = [left]
+            while self.peek() == token:
+                self.next()
+                args.append(self.unit())
+            return (AND if token == "&" else OR, args)
+        elif token == "=>":
+            self.next()
+            return (IMP, left, self.unit())
+        elif token == "<=":
+            self.next()
+            return (IMP, self.unit(), left)
+        elif token == "<=>":
+            self.next()
+            return (IFF, left, self.unit())
+        elif token == "<~>":
+            self.next()
+            return (NOT, (IFF, left, self.unit()))
+        elif token == "~|":
+            self.next()
+            return (NOT, (OR, [left, self.unit()]))
+        elif token == "~&":
+            self.next()
+            return (NOT, (AND, [left, self.unit()]))
+        return left
+
+    def unit(self) -> Tuple:
+        token = self.peek()
+        if token == "~":
+            self.next()
+            return (NOT, self.unit())
+        elif token in ("!", "?"):
+            self.next()
+            self.expect("[")
+            variables = []
+            while True:
+                name = self.next()
+                self.expect(":")
+                variables.append((name, self.next()))
+                if self.peek() != ",":
+                    break
+                self.next()
+            self.expect("]")
+            self.expect(":")
+            return (FORALL if token == "!" else EXISTS,
+                    variables, self.unit())
+        elif token == "(":
+            self.next()
+            formula = self.formula()
+            self.expect(")")
+            return formula
+        elif token == "$true":
+            self.next()
+            return (CONST, True)
+        elif token == "$false":
+            self.next()
+            return (CONST, False)
+        elif token == "$distinct":
+            self.next()
+            return (DISTINCT, self.arguments())
+
+        left = self.term()
+        if self.peek() == "=":
+            self.next()
+            return (EQ, left, self.term())
+        elif self.peek() == "!=":
+            self.next()
+            return (NOT, (EQ, left, self.term()))
+        return left
+
+    def term(self) -> Tuple:
+        name = self.next()
+        if not re.match(r"^[A-Za-z0-9_]+$", name):
+            raise ValueError(f"unexpected {name!r} in formula")
+        if name[0].isupper():
+            return (VAR, name)
+        elif self.peek() == "(":
+            return (APP, name, self.arguments())
+        return (APP, name, [])
+
+    def arguments(self) -> List[Tuple]:
+        self.expect("(")
+        args = [self.term()]
+        while self.peek() == ",":
+            self.next()
+            args.append(self.term())
+        self.expect(")")
+        return args
+
+
+class Engine:
+    """
+    In-process finite model finder for problems where every domain is a
+    FixedDom. The tables of all declared relations and operations are
+    searched directly by backtracking over their cells in a fixed order.
+    Every ground constraint is watched by its first unassigned cell, is
+    re-evaluated in three valued logic when that cell gets a value, and
+    prunes the values of the next cell when that is the only one missing.
+    The CPU time of the calling thread is charged to the budget.
+    """
+
+    def __init__(self, problem: 'Problem', budget: Optional[Budget] = None):
+        self.budget = budget
+        self.clock = time.thread_time()
+        self.domains: Dict[str, FixedDom] = {}
+        for name, dom in problem.domains.items():
+            if not isinstance(dom, FixedDom):
+                raise ValueError(f"domain {name} is not a FixedDom")
+            self.domains[name] = dom
+
+        # symbol name -> (first cell, domain sizes, codomain or None)
+        self.symbols: Dict[str, Tuple[int, List[int], Optional[str]]] = {}
+        self.symbol_domains: Dict[str, List[str]] = {}
+        self.elements: Dict[str, int] = {}
+        self.names: List[str] = []
+        self.num_cells = 0
+        self.candidates: List[List[Any]] = []
+
+        for dom in self.domains.values():
+            for idx, elem in enumerate(dom.elems):
+                self.elements[str(elem)] = idx
+
+        for symbols in (problem.relations, problem.operations,
+                        problem.functions):
+            for name, fun in symbols.items():
+                sizes = []
+                for dom in fun.domains:
+                    if str(dom) not in self.domains:
+                        raise ValueError(f"domain of {name} is not declared")
+                    sizes.append(self.domains[str(dom)].size)
+                if fun.codomain == BOOLEAN:
+                    codomain = None
+                    values = [False, True]
+                elif str(fun.codomain) in self.domains:
+                    codomain = str(fun.codomain)
+                    values = list(range(self.domains[codomain].size))
+                else:
+                    raise ValueError(f"codomain of {name} is not declared")
+
+                size = 1
+                for s in sizes:
+                    size *= s
+                self.symbols[name] = (self.num_cells, sizes, codomain)
+                self.symbol_domains[name] = [str(d) for d in fun.domains]
+                self.names.append(name)
+                self.num_cells += size
+                self.candidates.extend(list(values) for _ in range(size))
+
+        self.constraints: List[Tuple] = []
+        for line in problem.lines:
+            match = Parser.RE_STATEMENT.match(line)
+            if not match:
+                raise ValueError(f"cannot parse {line!r}")
+            if match.group(2).strip() != "axiom":
+                continue
+            formula = Parser(match.group(3)).parse()
+            self.ground(formula, {}, True)
+
+        self.values: List[Any] = [None] * self.num_cells
+        self.watches: List[Dict[int, None]] = [
+            {} for _ in range(self.num_cells)]
+        self.trail: List[Tuple] = []
+        self.order: List[int] = list(range(self.num_cells))
+        self.consistent = True
+
+    def ground(self, formula: Tuple, env: Dict[str, Any], top: bool):
+        # Grounds the formula and adds its top level conjuncts as
+        # separate constraints if top is set, otherwise returns it.
+        tag = formula[0]
+        if tag == FORALL and top:
+            for values in self.bindings(formula[1]):
+                env2 = dict(env)
+                env2.update(values)
+                self.ground(formula[2], env2, True)
+            return None
+        elif tag == AND and top:
+            for arg in formula[1]:
+                self.ground(arg, env, True)
+            return None
+
+        if tag == CONST:
+            expr = formula
+        elif tag == VAR:
+            if formula[1] not in env:
+                raise ValueError(f"unbound variable {formula[1]}")
+            expr = (CONST, env[formula[1]])
+        elif tag == APP:
+            expr = self.application(
+                formula[1], [self.ground(a, env, False) for a in formula[2]])
+        elif tag == EQ:
+            expr = Engine.make_eq(self.ground(formula[1], env, False),
+                                  self.ground(formula[2], env, False))
+        elif tag == NOT:
+            expr = Engine.make_not(self.ground(formula[1], env, False))
+        elif tag == AND:
+            expr = Engine.make_and(
+                [self.ground(a, env, False) for a in formula[1]])
+        elif tag == OR:
+            expr = Engine.make_or(
+                [self.ground(a, env, False) for a in formula[1]])
+        elif tag == IMP:
+            expr = Engine.make_or([
+                Engine.make_not(self.ground(formula[1], env, False)),
+                self.ground(formula[2], env, False)])
+        elif tag == IFF:
+            expr = Engine.make_iff(self.ground(formula[1], env, False),
+                                   self.ground(formula[2], env, False))
+        elif tag == FORALL or tag == EXISTS:
+            exprs = []
+            for values in self.bindings(formula[1]):
+                env2 = dict(env)
+                env2.update(values)
+                exprs.append(self.ground(formula[2], env2, False))
+            expr = Engine.make_and(exprs) if tag == FORALL \
+                else Engine.make_or(exprs)
+        elif tag == DISTINCT:
+            args = [self.ground(a, env, False) for a in formula[1]]
+            expr = Engine.make_and([
+                Engine.make_not(Engine.make_eq(args[i], args[j]))
+                for i in range(len(args)) for j in range(i + 1, len(args))])
+        else:
+            raise ValueError(f"unexpected {tag}")
+
+        if not top:
+            return expr
+        elif expr != (CONST, True):
+            self.constraints.append(expr)
+        return None
+
+    def bindings(self, variables: List[Tuple[str, str]]
+                 ) -> Iterator[Dict[str, int]]:
+        if not variables:
+            yield {}
+            return
+        name, dom = variables[0]
+        if dom not in self.domains:
+            raise ValueError(f"domain {dom} is not a FixedDom")
+        for rest in self.bindings(variables[1:]):
+            for idx in range(self.domains[dom].size):
+                values = dict(rest)
+                values[name] = idx
+                yield values
+
+    def application(self, name: str, args: List[Tuple]) -> Tuple:
+        if name in self.elements and not args:
+            return (CONST, self.elements[name])
+        elif name not in self.symbols:
+            raise ValueError(f"unknown symbol {name}")
+
+        start, sizes, _ = self.symbols[name]
+        assert len(args) == len(sizes)
+        if all(a[0] == CONST for a in args):
+            idx = 0
+            for a, s in zip(args, sizes):
+                idx = idx * s + a[1]
+            return (CELL, start + idx)
+        return (APP, start, sizes, args)
+
+    @staticmethod
+    def make_eq(left: Tuple, right: Tuple) -> Tuple:
+        if left[0] == CONST and right[0] == CONST:
+            return (CONST, left[1] == right[1])
+        return (EQ, left, right)
+
+    @staticmethod
+    def make_not(expr: Tuple) -> Tuple:
+        if expr[0] == CONST:
+            return (CONST, not expr[1])
+        elif expr[0] == NOT:
+            return expr[1]
+        return (NOT, expr)
+
+    @staticmethod
+    def make_and(exprs: List[Tuple]) -> Tuple:
+        args = []
+        for expr in exprs:
+            if expr[0] == CONST:
+                if not expr[1]:
+                    return expr
+            elif expr[0] == AND:
+                args.extend(expr[1])
+            else:
+                args.append(expr)
+        if not args:
+            return (CONST, True)
+        elif len(args) == 1:
+            return args[0]
+        return (AND, args)
+
+    @staticmethod
+    def make_or(exprs: List[Tuple]) -> Tuple:
+        args = []
+        for expr in exprs:
+            if expr[0] == CONST:
+                if expr[1]:
+                    return expr
+            elif expr[0] == OR:
+                args.extend(expr[1])
+            else:
+                args.append(expr)
+        if not args:
+            return (CONST, False)
+        elif len(args) == 1:
+            return args[0]
+        return (OR, args)
+
+    @staticmethod
+    def make_iff(left: Tuple, right: Tuple) -> Tuple:
+        if left[0] == CONST:
+            return right if left[1] else Engine.make_not(right)
+        elif right[0] == CONST:
+            return left if right[1] else Engine.make_not(left)
+        return (IFF, left, right)
+
+    def evaluate(self, expr: Tuple, unknown: List[int]) -> Any:
+        # Three valued evaluation, returns None if the value is not yet
+        # determined and collects the unassigned cells it depends on. A
+        # cell pruned to a single candidate already has that value.
+        tag = expr[0]
+        if tag == CELL:
+            value = self.values[expr[1]]
+            if value is None:
+                candidates = self.candidates[expr[1]]
+                if len(candidates) == 1:
+                    return candidates[0]
+                unknown.append(expr[1])
+            return value
+        elif tag == NOT:
+            value = self.evaluate(expr[1], unknown)
+            return None if value is None else not value
+        elif tag == AND:
+            result = True
+            for arg in expr[1]:
+                value = self.evaluate(arg, unknown)
+                if value is None:
+                    result = None
+                elif not value:
+                    return False
+            return result
+        elif tag == OR:
+            result = False
+            for arg in expr[1]:
+                value = self.evaluate(arg, unknown)
+                if value is None:
+                    result = None
+                elif value:
+                    return True
+            return result
+        elif tag == EQ:
+            left = self.evaluate(expr[1], unknown)
+            right = self.evaluate(expr[2], unknown)
+            if left is None or right is None:
+                return None
+            return left == right
+        elif tag == IFF:
+            left = self.evaluate(expr[1], unknown)
+            right = self.evaluate(expr[2], unknown)
+            if left is None or right is None:
+                return None
+            return left == right
+        elif tag == APP:
+            idx = 0
+            for arg, size in zip(expr[3], expr[2]):
+                value = self.evaluate(arg, unknown)
+                if value is None:
+                    idx = None
+                elif idx is not None:
+                    idx = idx * size + value
+            if idx is None:
+                return None
+            value = self.values[expr[1] + idx]
+            if value is None:
+                candidates = self.candidates[expr[1] + idx]
+                if len(candidates) == 1:
+                    return candidates[0]
+                unknown.append(expr[1] + idx)
+            return value
+        elif tag == CONST:
+            return expr[1]
+        raise ValueError(f"unexpected {tag}")
+
+    def set_order(self, names: List[str]) -> int:
+        # Cells with a single candidate are searched first followed by the
+        # cells of the given symbols, returns the number of these cells.
+        # Nullary symbols, like the predicates of a blocking trie, come
+        # last, because they are usually implied by the other cells.
+        self.consistent = True
+        for expr in self.constraints:
+            unknown = []
+            value = self.evaluate(expr, unknown)
+            if value is None and all(u == unknown[0] for u in unknown):
+                self.candidates[unknown[0]] = self.prune(unknown[0], expr)
+                value = None if self.candidates[unknown[0]] else False
+            if value is False:
+                self.consistent = False
+                return 0
+
+        rank = [None] * self.num_cells
+        order = [cell for cell in range(self.num_cells)
+                 if len(self.candidates[cell]) == 1]
+        for idx, cell in enumerate(order):
+            rank[cell] = idx
+        projected = None
+        others = sorted(self.names, key=lambda n: not self.symbols[n][1])
+        for name in names + [None] + others:
+            if name is None:
+                projected = len(order)
+                continue
+            start, sizes, _ = self.symbols[name]
+            size = 1
+            for s in sizes:
+                size *= s
+            for cell in range(start, start + size):
+                if rank[cell] is None:
+                    rank[cell] = len(order)
+                    order.append(cell)
+        self.order = order
+        self.rank = rank
+
+        for watch in self.watches:
+            watch.clear()
+        for idx, expr in enumerate(self.constraints):
+            if not self.update(idx, expr, None):
+                self.consistent = False
+                break
+        self.trail.clear()
+        return projected
+
+    def prune(self, cell: int, expr: Tuple) -> List[Any]:
+        # Returns the candidates of the cell that do not falsify the
+        # constraint, where this is the only unassigned cell it reads.
+        values = []
+        for value in self.candidates[cell]:
+            self.values[cell] = value
+            if self.evaluate(expr, []) is not False:
+                values.append(value)
+        self.values[cell] = None
+        return values
+
+    def update(self, idx: int, expr: Tuple, cell: Optional[int]) -> bool:
+        # Re-evaluates the constraint watched by the given cell, moves the
+        # watch to the next unassigned cell and prunes its candidates.
+        unknown = []
+        value = self.evaluate(expr, unknown)
+        if value is not None:
+            return value
+
+        first = min(unknown, key=self.rank.__getitem__)
+        if cell is not None:
+            del self.watches[cell][idx]
+            self.trail.append((cell, idx, first))
+        self.watches[first][idx] = None
+
+        if all(u == first for u in unknown):
+            old = self.candidates[first]
+            new = self.prune(first, expr)
+            if len(new) != len(old):
+                self.trail.append((first, old))
+                self.candidates[first] = new
+                if not new:
+                    return False
+        return True
+
+    def assign(self, cell: int, value: Any) -> bool:
+        self.values[cell] = value
+        self.trail.append((cell, ))
+        for idx in list(self.watches[cell]):
+            if not self.update(idx, self.constraints[idx], cell):
+                return False
+        return True
+
+    def undo(self, mark: int):
+        while len(self.trail) > mark:
+            entry = self.trail.pop()
+            if len(entry) == 1:
+                self.values[entry[0]] = None
+            elif len(entry) == 2:
+                self.candidates[entry[0]] = entry[1]
+            else:
+                del self.watches[entry[2]][entry[1]]
+                self.watches[entry[0]][entry[1]] = None
+
+    def spend(self):
+        # Charges the CPU time of this thread since the last call, the
+        # clock is reset when the caller resumes a generator.
+        now = time.thread_time()
+        if self.budget is not None:
+            self.budget.charge(max(0.0, now - self.clock))
+        self.clock = now
+
+    def search(self, start: int, limit: int) -> Iterator[None]:
+        # Yields each consistent assignment of the cells order[start:limit]
+        # extending the current one, which is restored at the end.
+        if start == limit:
+            yield
+            return
+
+        cell = self.order[start]
+        stack = [(cell, list(reversed(self.candidates[cell])),
+                  len(self.trail))]
+        steps = 0
+        while stack:
+            steps += 1
+            if self.budget is not None and steps % 1024 == 0:
+                self.spend()
+                if self.budget.exhausted:
+                    raise ResourceOut("budget exhausted")
+
+            cell, candidates, mark = stack[-1]
+            self.undo(mark)
+            if not candidates:
+                stack.pop()
+                continue
+            if not self.assign(cell, candidates.pop()):
+                continue
+            depth = start + len(stack)
+            if depth == limit:
+                yield
+            else:
+                cell = self.order[depth]
+                stack.append((cell, list(reversed(self.candidates[cell])),
+                              len(self.trail)))
+
+    def table(self, name: str) -> List[Any]:
+        start, sizes, _ = self.symbols[name]
+        size = 1
+        for s in sizes:
+            size *= s
+        return self.values[start:start + size]
+
+    def model(self) -> Dict[str, Any]:
+        domains = {name: [str(e) for e in dom.elems]
+                   for name, dom in self.domains.items()}
+        predicates = {}
+        functions = {}
+        for name, dom in self.domains.items():
+            for idx, elem in enumerate(dom.elems):
+                functions[str(elem)] = {
+                    "domains": [],
+                    "codomain": name,
+                    "table": [idx],
+                }
+        for name in self.names:
+            codomain = self.symbols[name][2]
+            doms = self.symbol_domains[name]
+            if codomain is None:
+                predicates[name] = {
+                    "domains": doms,
+                    "table": self.table(name),
+                }
+            else:
+                functions[name] = {
+                    "domains": doms,
+                    "codomain": codomain,
+                    "table": self.table(name),
+                }
+        return {
+            "domains": domains,
+            "predicates": predicates,
+            "functions": functions,
+        }
+
+    @typechecked
+    def find_one_model(self) -> Optional[Dict[str, Any]]:
+        self.set_order([])
+        if not self.consistent:
+            return None
+        mark = len(self.trail)
+        for _ in self.search(0, self.num_cells):
+            model = self.model()
+            self.undo(mark)
+            return model
+        return None
+
+    @typechecked
+    def yield_all_models(self, names: List[str]) -> Iterator[Dict[str, Any]]:
+        projected = self.set_order(names)
+        if not self.consistent:
+            return
+
+        for _ in self.search(0, projected):
+            mark = len(self.trail)
+            for _ in self.search(projected, self.num_cells):
+                result = {name: self.table(name) for name in names}
+                self.undo(mark)
+                self.spend()
+                yield result
+                self.clock = time.thread_time()
+                break
@@ -13,10 +13,27 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-from typing import Iterator, List
+from functools import cached_property
+import itertools
+from typing import Any, Iterator, List, Optional, Union
 from typeguard import typechecked
 
-from .domain import Domain, Term
+from .domain import Domain, Term, FixedDom
+
+
+@typechecked
+def table_values(table: Any) -> List[Optional[Union[int, Term]]]:
+    # Tables can be lists, bytes or numpy arrays in row major order, where
+    # None, negative values and 255 in byte tables mark unspecified cells.
+    if isinstance(table, (bytes, bytearray, memoryview)):
+        return [None if v == 255 else v for v in bytes(table)]
+    elif hasattr(table, "dtype"):
+        kind, size = table.dtype.kind, table.dtype.itemsize
+        blank = 255 if kind == "u" and size == 1 else -1
+        return [None if v == blank else v for v in table.ravel().tolist()]
+    else:
+        return [None if v is None or (not isinstance(v, Term) and v < 0)
+                else v for v in table]
 
 
 class Function:
@@ -53,4 +70,11 @@ class Function:
         if self.arity == 0:
             return Term(self.codomain, self.name)
         else:
-            return Term(self.codomain, f"{self.name}({','.join(str(e) for e in elems)})")
+            return Term.apply(self.codomain, self.name, list(elems))
+
+    @cached_property
+    def cells(self) -> List[Term]:
+        # The terms of all cells in row major order, built only once.
+        assert all(isinstance(d, FixedDom) for d in self.domains)
+        return [Term.apply(self.codomain, self.name, list(coord))
+                for coord in itertools.product(*[d.elems for d in self.domains])]
@@ -0,0 +1,199 @@
+# Copyright (C) 2024, Miklos Maroti
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import hashlib
+from typing import Callable, Dict, Iterator, List, Tuple
+from typeguard import typechecked
+
+from .canonical import canonical_form
+
+# A relation on the elements 0, ..., k-1 is stored by the bit masks
+# below[j] of the elements i with rel(i, j) and above[i] of the elements
+# j with rel(i, j).
+Masks = Tuple[List[int], List[int]]
+
+
+def relation_table(size: int, below: List[int]) -> List[bool]:
+    # The table in the row major order used by has_values and models.
+    return [bool(below[j] >> i & 1) for i in range(size) for j in range(size)]
+
+
+def closed_sets(mask: int, below: List[int],
+                above: List[int]) -> Iterator[int]:
+    # Yields the subsets of mask closed downwards, where mask is closed.
+    # Each step splits on whether the lowest element is included, so all
+    # branches produce at least one set.
+    if not mask:
+        yield 0
+        return
+    elem = (mask & -mask).bit_length() - 1
+    yield from closed_sets(mask & ~above[elem], below, above)
+    base = below[elem] & mask
+    for rest in closed_sets(mask & ~below[elem], below, above):
+        yield base | rest
+
+
+def order_extensions(masks: Masks, antisymmetric: bool) -> Iterator[Masks]:
+    # Adds a new element to a quasi-order (or partial order) in all
+    # possible ways: its down-set D and up-set U are closed and every
+    # element of D is below every element of U.
+    below, above = masks
+    size = len(below)
+    new = 1 << size
+    for down in closed_sets(new - 1, below, above):
+        bounds = new - 1
+        for i in range(size):
+            if down >> i & 1:
+                bounds &= above[i]
+        if antisymmetric:
+            bounds &= ~down
+        for up in closed_sets(bounds, above, below):
+            yield ([below[j] | new if up >> j & 1 else below[j]
+                    for j in range(size)] + [down | new],
+                   [above[i] | new if down >> i & 1 else above[i]
+                    for i in range(size)] + [up | new])
+
+
+def reflexive_extensions(masks: Masks) -> Iterator[Masks]:
+    below, above = masks
+    size = len(below)
+    new = 1 << size
+    for down in range(new):
+        for up in range(new):
+            yield ([below[j] | new if up >> j & 1 else below[j]
+                    for j in range(size)] + [down | new],
+                   [above[i] | new if down >> i & 1 else above[i]
+                    for i in range(size)] + [up | new])
+
+
+def labelled(size: int, extend: Callable[[Masks], Iterator[Masks]],
+             ) -> Iterator[List[bool]]:
+    def search(masks: Masks) -> Iterator[List[bool]]:
+        if len(masks[0]) == size:
+            yield relation_table(size, masks[0])
+            return
+        for masks2 in extend(masks):
+            yield from search(masks2)
+
+    yield from search(([], []))
+
+
+def unlabelled(size: int, extend: Callable[[Masks], Iterator[Masks]],
+               ) -> Iterator[List[bool]]:
+    # Extends one representative of each isomorphism class level by level.
+    # This is complete, because removing the last element of a structure
+    # leaves a structure of the same kind.
+    level = [([], [])]
+    for count in range(1, size + 1):
+        seen = set()
+        level2 = []
+        for masks in level:
+            for masks2 in extend(masks):
+                table = relation_table(count, masks2[0])
+                form = canonical_form(count, [table])
+                digest = hashlib.blake2b(
+                    repr(form).encode(), digest_size=16).digest()
+                if digest not in seen:
+                    seen.add(digest)
+                    level2.append(masks2)
+        level = level2
+
+    for masks in level:
+        yield relation_table(size, masks[0])
+
+
+@typechecked
+def reflexive_relations(size: int,
+                        up_to_iso: bool = False) -> Iterator[List[bool]]:
+    assert size >= 0
+    if up_to_iso:
+        yield from unlabelled(size, reflexive_extensions)
+        return
+
+    # Gray code order, consecutive tables differ in one off-diagonal entry
+    cells = [i * size + j for i in range(size) for j in range(size) if i != j]
+    table = [i % (size + 1) == 0 for i in range(size * size)]
+    yield list(table)
+    for step in range(1, 1 << len(cells)):
+        cell = cells[(step & -step).bit_length() - 1]
+        table[cell] = not table[cell]
+        yield list(table)
+
+
+@typechecked
+def quasi_orders(size: int, up_to_iso: bool = False) -> Iterator[List[bool]]:
+    assert size >= 0
+
+    def extend(masks: Masks) -> Iterator[Masks]:
+        return order_extensions(masks, False)
+
+    yield from (unlabelled if up_to_iso else labelled)(size, extend)
+
+
+@typechecked
+def partial_orders(size: int, up_to_iso: bool = False) -> Iterator[List[bool]]:
+    assert size >= 0
+
+    def extend(masks: Masks) -> Iterator[Masks]:
+        return order_extensions(masks, True)
+
+    yield from (unlabelled if up_to_iso else labelled)(size, extend)
+
+
+def growth_strings(size: int) -> Iterator[List[int]]:
+    # Restricted growth strings, where each entry is at most one more
+    # than the maximum of the previous ones.
+    blocks = [0] * size
+
+    def search(idx: int, count: int) -> Iterator[List[int]]:
+        if idx == size:
+            yield blocks
+            return
+        for block in range(count + 1):
+            blocks[idx] = block
+            yield from search(idx + 1, max(count, block + 1))
+
+    yield from search(0, 0)
+
+
+def partitions(size: int, largest: int) -> Iterator[List[int]]:
+    # Integer partitions into non-increasing parts at most largest.
+    if size == 0:
+        yield []
+        return
+    for part in range(min(size, largest), 0, -1):
+        for rest in partitions(size - part, part):
+            yield [part] + rest
+
+
+@typechecked
+def equivalences(size: int, up_to_iso: bool = False) -> Iterator[List[bool]]:
+    assert size >= 0
+    if up_to_iso:
+        for parts in partitions(size, size):
+            blocks = [idx for idx, part in enumerate(parts)
+                      for _ in range(part)]
+            yield [a == b for a in blocks for b in blocks]
+    else:
+        for blocks in growth_strings(size):
+            yield [a == b for a in blocks for b in blocks]
+
+
+@typechecked
+def as_models(name: str,
+              tables: Iterator[List[bool]]) -> Iterator[Dict[str, List[bool]]]:
+    # The format of yield_all_models projected to the single relation.
+    for table in tables:
+        yield {name: table}
@@ -13,10 +13,10 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-from typing import Iterator
+from typing import Iterator, List, Optional, Tuple
 from typeguard import typechecked
 
-from .domain import FixedDom, Term
+from .domain import FixedDom, Term, BOOLEAN, TRUE
 from .operation import Operation
 from .function import Function
 
@@ -50,7 +50,7 @@ class OrdLex(Operation):
         idx = 0
         for a in ORDDOM.elems:
             for b in ORDDOM.elems:
-                c = a if a.value != ORDDOM.EQ.value else b
+                c = a if a is not ORDDOM.EQ else b
                 yield f"tff(lex_table_{idx}, axiom, {self(a, b) == c})."
                 idx += 1
 
@@ -75,3 +75,23 @@ class OrdCmp(Function):
 
 ORDDOM = OrdDom()
 ORDLEX = OrdLex()
+
+
+@typechecked
+def lex_less_equal(pairs: List[Tuple[Term, Term]],
+                   cmp: Optional[OrdCmp] = None) -> Term:
+    # The sequence of first elements is lexicographically less than or
+    # equal to the second, booleans are compared with false < true and
+    # elements of the fixed domain with cmp.
+    result = TRUE
+    for a, b in reversed(pairs):
+        assert a.domain == b.domain
+        if a.domain == BOOLEAN:
+            less = ~a & b
+            equal = a.iff(b)
+        else:
+            assert cmp is not None and a.domain == cmp.domain
+            less = cmp(a, b) == ORDDOM.LT
+            equal = a == b
+        result = less | (equal & result)
+    return result
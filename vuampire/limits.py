@@ -0,0 +1,217 @@
+# Copyright (C) 2024, Miklos Maroti
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import errno
+import math
+import os
+import resource
+import signal
+import subprocess
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+from typeguard import typechecked
+import weakref
+
+
+class ResourceOut(RuntimeError):
+    """
+    The solver did not decide the problem, because it ran out of time or
+    memory, was cancelled or gave up. This is different from returning no
+    model, which means that the problem has none.
+    """
+    pass
+
+
+def kill_process(process: subprocess.Popen):
+    # Solvers are started in their own session, so that helper processes
+    # they fork are killed with them.
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def wait_process(process: subprocess.Popen,
+                 budget: Optional['Budget'] = None) -> resource.struct_rusage:
+    # Reaps the process and returns its own resource usage. With a budget
+    # the exited process is reaped under its lock, so that a timer or a
+    # cancel cannot kill the process group of a recycled pid.
+    if budget is None:
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        return usage
+    os.waitid(os.P_PID, process.pid, os.WEXITED | os.WNOWAIT)
+    with budget.lock:
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        return usage
+
+
+class Budget:
+    """
+    Wall time and CPU time limits in seconds and a memory limit in bytes
+    for one or more solver calls. The wall time runs from the creation of
+    the budget, the CPU time of the solver processes and of the threads
+    running in-process solvers is accumulated, and the memory limit
+    applies to each solver process separately. Calling
+    cancel from any thread kills the running solvers and calls the cancel
+    hooks of in-process solvers.
+    """
+
+    # exit codes of solvers that could not allocate memory
+    OUT_OF_MEMORY = (-signal.SIGKILL, -signal.SIGABRT, -signal.SIGSEGV,
+                     errno.ENOMEM)
+
+    @typechecked
+    def __init__(self,
+                 wall_time: Optional[float] = None,
+                 cpu_time: Optional[float] = None,
+                 memory: Optional[int] = None):
+        self.deadline = None if wall_time is None \
+            else time.monotonic() + wall_time
+        self.cpu_time = cpu_time
+        self.memory = memory
+        self.cpu_used = 0.0
+        self.lock = threading.Lock()
+        self.cancelled = threading.Event()
+        self.processes: Dict[int, subprocess.Popen] = {}
+        self.timers: Dict[int, threading.Timer] = {}
+        self.killed = set()
+        self.hooks: List[Callable[[], None]] = []
+        self.parent: Optional[Budget] = None
+        self.children: weakref.WeakSet[Budget] = weakref.WeakSet()
+
+    @typechecked
+    def child(self) -> 'Budget':
+        # A budget with the remaining limits of this one that can be
+        # cancelled separately. It is cancelled together with this one,
+        # and the CPU time used under it is counted here as well.
+        budget = Budget(cpu_time=self.remaining_cpu_time(),
+                        memory=self.memory)
+        budget.deadline = self.deadline
+        budget.parent = self
+        with self.lock:
+            self.children.add(budget)
+        if self.cancelled.is_set():
+            budget.cancel()
+        return budget
+
+    def remaining_wall_time(self) -> Optional[float]:
+        if self.deadline is None:
+            return None
+        return self.deadline - time.monotonic()
+
+    def remaining_cpu_time(self) -> Optional[float]:
+        if self.cpu_time is None:
+            return None
+        return self.cpu_time - self.cpu_used
+
+    @property
+    def exhausted(self) -> bool:
+        if self.cancelled.is_set():
+            return True
+        wall_time = self.remaining_wall_time()
+        cpu_time = self.remaining_cpu_time()
+        return (wall_time is not None and wall_time <= 0.0) \
+            or (cpu_time is not None and cpu_time <= 0.0)
+
+    def cancel(self):
+        self.cancelled.set()
+        with self.lock:
+            for process in list(self.processes.values()):
+                self.kill(process)
+            hooks = list(self.hooks)
+            children = list(self.children)
+        for hook in hooks:
+            hook()
+        for budget in children:
+            budget.cancel()
+
+    def charge(self, cpu_time: float):
+        # Adds the CPU time used by an in-process solver.
+        with self.lock:
+            self.cpu_used += cpu_time
+        if self.parent is not None:
+            with self.parent.lock:
+                self.parent.cpu_used += cpu_time
+
+    def add_hook(self, hook: Callable[[], None]):
+        # The hook is called from the thread calling cancel, or right away
+        # if the budget is already cancelled.
+        with self.lock:
+            self.hooks.append(hook)
+        if self.cancelled.is_set():
+            hook()
+
+    def remove_hook(self, hook: Callable[[], None]):
+        with self.lock:
+            self.hooks.remove(hook)
+
+    def kill(self, process: subprocess.Popen):
+        # must be called with the lock held
+        if process.pid in self.processes and process.returncode is None:
+            self.killed.add(process.pid)
+            kill_process(process)
+
+    def expire(self, process: subprocess.Popen):
+        with self.lock:
+            self.kill(process)
+
+    def register(self, process: subprocess.Popen):
+        # Applies the limits to a freshly started solver process. The input
+        # is written only after this, so the solver has not done any work.
+        cpu_time = self.remaining_cpu_time()
+        if cpu_time is not None:
+            seconds = max(1, math.ceil(cpu_time))
+            resource.prlimit(process.pid, resource.RLIMIT_CPU,
+                             (seconds, seconds + 1))
+        if self.memory is not None:
+            resource.prlimit(process.pid, resource.RLIMIT_AS,
+                             (self.memory, self.memory))
+
+        with self.lock:
+            self.processes[process.pid] = process
+            if self.exhausted:
+                self.kill(process)
+                return
+
+            wall_time = self.remaining_wall_time()
+            if wall_time is not None:
+                timer = threading.Timer(wall_time, self.expire, [process])
+                timer.daemon = True
+                timer.start()
+                self.timers[process.pid] = timer
+
+    def unregister(self, process: subprocess.Popen, cpu_time: float) -> bool:
+        # Returns true if the process was stopped by one of the limits.
+        with self.lock:
+            self.cpu_used += cpu_time
+            del self.processes[process.pid]
+            timer = self.timers.pop(process.pid, None)
+            if timer is not None:
+                timer.cancel()
+            if self.parent is not None:
+                with self.parent.lock:
+                    self.parent.cpu_used += cpu_time
+            if process.pid in self.killed:
+                self.killed.remove(process.pid)
+                return True
+
+        if self.cpu_time is not None and process.returncode in (
+                -signal.SIGXCPU, -signal.SIGKILL):
+            return True
+        return self.memory is not None \
+            and process.returncode in Budget.OUT_OF_MEMORY
@@ -0,0 +1,218 @@
+# Copyright (C) 2024, Miklos Maroti
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import json
+import re
+from typing import Any, Dict, List, Optional
+from typeguard import typechecked
+
+from .statistics import SolverStatistics
+
+
+class ModelParser:
+    """
+    Incremental parser of the finite model printed by the fmb saturation
+    algorithm. Lines are fed as they arrive from the solver, the cells of
+    the predicate and function tables are decoded one atom at a time with
+    element to index dictionaries, so the text is dropped once consumed.
+    """
+
+    RE_HEADER = re.compile(r"^tff\(([\w\s]*),([\w\s]*),(.*)$", flags=re.DOTALL)
+    RE_REMOVE_SPACE = re.compile(r"\s")
+    RE_DOMAIN_DECL = re.compile(r"^(\w*):\$tType$")
+    RE_PREDICATE_DECL = re.compile(r"^(\w*):(?:|\((.*)\)>)\$o$")
+    RE_FUNCTION_DECL = re.compile(r"^(\w*):(?:|\((.*)\)>)(\w*)$")
+    RE_FINITE_DOM = re.compile(r"^!\[X:(\w*)\]:\((.*)\)$")
+
+    def __init__(self):
+        self.found = False
+        self.domains: Dict[str, List[str]] = {}
+        self.indices: Dict[str, Dict[str, int]] = {}
+        self.predicates: Dict[str, Dict[str, Any]] = {}
+        self.functions: Dict[str, Dict[str, Any]] = {}
+
+        self.name: Optional[str] = None
+        self.role: Optional[str] = None
+        self.pending = ""
+        self.streaming = False
+
+    def feed(self, line: str):
+        if self.name is None:
+            if "Finite Model Found!" in line:
+                self.found = True
+                return
+            elif not self.found or not line.startswith("tff("):
+                return
+
+            match = ModelParser.RE_HEADER.match(line.strip())
+            if not match:
+                return
+            self.name = match.group(1).strip()
+            self.role = match.group(2).strip()
+            self.pending = ""
+            self.streaming = self.role == "axiom" and (
+                self.name.startswith("predicate_")
+                or self.name.startswith("function_"))
+            line = match.group(3)
+        elif line.startswith("%"):
+            return
+
+        line = line.rstrip()
+        finished = line.endswith(").")
+        if finished:
+            line = line[:-2]
+        self.pending += ModelParser.RE_REMOVE_SPACE.sub("", line)
+
+        if self.streaming:
+            atoms = self.pending.split("&")
+            self.pending = atoms.pop() if not finished else ""
+            for atom in atoms:
+                if atom:
+                    self.atom(atom)
+
+        if finished:
+            if not self.streaming:
+                self.statement(self.name, self.role, self.pending)
+            self.name = None
+            self.role = None
+            self.pending = ""
+
+    def index(self, doms: List[str], elems: List[str]) -> int:
+        assert len(elems) == len(doms)
+        idx = 0
+        for dom, elem in zip(doms, elems):
+            idx = idx * len(self.domains[dom]) + self.indices[dom][elem]
+        return idx
+
+    def atom(self, atom: str):
+        if self.name.startswith("predicate_"):
+            name = self.name[10:]
+            pred = self.predicates[name]
+            negated = atom.startswith("~")
+            if negated:
+                atom = atom[1:]
+            assert atom.startswith(name + "(") and atom.endswith(")")
+            idx = self.index(pred["domains"],
+                             atom[len(name) + 1:-1].split(","))
+            assert pred["table"][idx] is None
+            pred["table"][idx] = not negated
+        else:
+            name = self.name[9:]
+            fun = self.functions[name]
+            left, right = atom.split("=")
+            assert left.startswith(name + "(") and left.endswith(")")
+            idx = self.index(fun["domains"],
+                             left[len(name) + 1:-1].split(","))
+            assert fun["table"][idx] is None
+            fun["table"][idx] = self.indices[fun["codomain"]][right]
+
+    def table_size(self, doms: List[str]) -> int:
+        size = 1
+        for dom in doms:
+            size *= len(self.domains[dom])
+        return size
+
+    def statement(self, name: str, role: str, formula: str):
+        if role == "type":
+            match = ModelParser.RE_DOMAIN_DECL.match(formula)
+            if match:
+                name = match.group(1)
+                assert name not in self.domains
+                self.domains[name] = []
+                self.indices[name] = {}
+                return
+
+            match = ModelParser.RE_PREDICATE_DECL.match(formula)
+            if match:
+                name = match.group(1)
+                doms = match.group(2)
+                doms = [] if doms is None else doms.split("*")
+                assert name not in self.predicates
+                self.predicates[name] = {
+                    "domains": doms,
+                    "table": [None] * self.table_size(doms),
+                }
+                return
+
+            match = ModelParser.RE_FUNCTION_DECL.match(formula)
+            if match:
+                name = match.group(1)
+                doms = match.group(2)
+                doms = [] if doms is None else doms.split("*")
+                assert name not in self.functions
+                self.functions[name] = {
+                    "domains": doms,
+                    "codomain": match.group(3),
+                    "table": [None] * self.table_size(doms),
+                }
+
+        elif role != "axiom":
+            return
+
+        elif name.startswith("finite_domain_"):
+            name = name[14:]
+            match = ModelParser.RE_FINITE_DOM.match(formula)
+            assert name == match.group(1) and self.domains[name] == []
+            dom = self.domains[name]
+            indices = self.indices[name]
+            for idx, elem in enumerate(match.group(2).split("|")):
+                assert elem.startswith("X=")
+                elem = elem[2:]
+                dom.append(elem)
+                indices[elem] = idx
+                fun = self.functions[elem]
+                assert fun["domains"] == [] and fun["codomain"] == name
+                assert fun["table"][0] is None
+                fun["table"][0] = idx
+
+        elif name.endswith("_definition"):
+            name = name[:-11]
+            if name in self.predicates:
+                assert formula == name or formula == "~" + name
+                pred = self.predicates[name]
+                assert pred["domains"] == [] and pred["table"][0] is None
+                pred["table"][0] = formula == name
+            elif name in self.functions:
+                left, right = formula.split("=")
+                assert left == name
+                fun = self.functions[name]
+                assert fun["domains"] == [] and fun["table"][0] is None
+                fun["table"][0] = self.indices[fun["codomain"]][right]
+
+    @typechecked
+    def result(self) -> Optional[Dict[str, Any]]:
+        if not self.found:
+            return None
+
+        return {
+            "domains": self.domains,
+            "predicates": self.predicates,
+            "functions": self.functions,
+        }
+
+
+def encode_value(value: Any) -> Any:
+    if isinstance(value, SolverStatistics):
+        return value.as_dict()
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return list(value)
+
+
+@typechecked
+def dump_model(model: Dict[str, Any]) -> str:
+    # One line of JSON, numpy arrays and byte tables become lists and the
+    # solver statistics a dictionary.
+    return json.dumps(model, default=encode_value)
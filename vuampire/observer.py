@@ -0,0 +1,155 @@
+# Copyright (C) 2024, Miklos Maroti
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import json
+import threading
+from typing import Any, Dict, List, Optional, Sequence, TextIO
+from typeguard import typechecked
+
+from .statistics import SolverStatistics
+
+
+class SolverCall:
+    """
+    Measurements of a single solver call. Times are in seconds and sizes
+    in bytes. The wall time includes the parsing of the output, the CPU
+    time and peak memory are those of the solver process. For the
+    in-process backends the CPU time is that of the calling thread and
+    the peak memory is not known, so it is None. Results read from the
+    cache have no CPU time and memory.
+    """
+
+    def __init__(self, backend: str, options: Sequence[str],
+                 input_bytes: int, axioms: int):
+        self.backend = backend
+        self.options = list(options)
+        self.input_bytes = input_bytes
+        self.axioms = axioms
+        self.cached = False
+        self.wall_time = 0.0
+        self.cpu_time = 0.0
+        self.max_rss: Optional[int] = 0
+        self.output_bytes = 0
+        self.parse_time = 0.0
+        self.model_found: Optional[bool] = None
+        self.statistics: Optional[SolverStatistics] = None
+        self.error: Optional[str] = None
+
+
+class Enumeration:
+    """
+    Aggregate measurements of a model enumeration, the blocking clauses
+    are the axioms added to the problem to exclude the models found.
+    """
+
+    def __init__(self, backend: str, names: Sequence[str], jobs: int,
+                 input_bytes: int, axioms: int):
+        self.backend = backend
+        self.names = list(names)
+        self.jobs = jobs
+        self.input_bytes = input_bytes
+        self.axioms = axioms
+        self.models = 0
+        self.wall_time = 0.0
+        self.blocking_clauses = 0
+        self.blocking_bytes = 0
+        self.error: Optional[str] = None
+
+    @property
+    def models_per_second(self) -> float:
+        return self.models / self.wall_time if self.wall_time > 0.0 else 0.0
+
+
+class Observer:
+    """
+    Receives the measurements of solver calls and enumerations, possibly
+    from several threads at once. Nothing is measured if no observer is
+    attached to Problem.observers.
+    """
+
+    def solver_call(self, event: SolverCall):
+        pass
+
+    def enumeration(self, event: Enumeration):
+        pass
+
+
+class Collector(Observer):
+    """
+    Keeps all events in memory.
+    """
+
+    @typechecked
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.solver_calls: List[SolverCall] = []
+        self.enumerations: List[Enumeration] = []
+
+    def solver_call(self, event: SolverCall):
+        with self.lock:
+            self.solver_calls.append(event)
+
+    def enumeration(self, event: Enumeration):
+        with self.lock:
+            self.enumerations.append(event)
+
+    @typechecked
+    def summary(self) -> Dict[str, Any]:
+        with self.lock:
+            calls = list(self.solver_calls)
+        return {
+            "solver_calls": len(calls),
+            "cached": sum(1 for c in calls if c.cached),
+            "errors": sum(1 for c in calls if c.error is not None),
+            "models_found": sum(1 for c in calls if c.model_found),
+            "wall_time": sum(c.wall_time for c in calls),
+            "cpu_time": sum(c.cpu_time for c in calls),
+            "parse_time": sum(c.parse_time for c in calls),
+            "input_bytes": sum(c.input_bytes for c in calls),
+            "output_bytes": sum(c.output_bytes for c in calls),
+            "max_rss": max((c.max_rss for c in calls
+                            if c.max_rss is not None), default=0),
+        }
+
+
+class JsonLinesExporter(Observer):
+    """
+    Writes every event as a JSON object on a separate line to the given
+    file or file name.
+    """
+
+    @typechecked
+    def __init__(self, file: str | TextIO):
+        self.lock = threading.Lock()
+        self.owned = isinstance(file, str)
+        self.file = open(file, "a") if isinstance(file, str) else file
+
+    def write(self, kind: str, data: Dict[str, Any]):
+        line = json.dumps(dict(event=kind, **data), default=vars)
+        with self.lock:
+            self.file.write(line + "\n")
+            self.file.flush()
+
+    def solver_call(self, event: SolverCall):
+        self.write("solver_call", vars(event))
+
+    def enumeration(self, event: Enumeration):
+        data = dict(vars(event))
+        data["models_per_second"] = event.models_per_second
+        self.write("enumeration", data)
+
+    def close(self):
+        if self.owned:
+            self.file.close()
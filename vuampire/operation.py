@@ -13,11 +13,11 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-from typing import List, Optional
+from typing import Any
 from typeguard import typechecked
 
-from .domain import Domain, Term, FixedDom, BOOLEAN
-from .function import Function
+from .domain import Domain, Term, FixedDom, TRUE
+from .function import Function, table_values
 from .relation import Relation
 
 
@@ -61,7 +61,7 @@ class Operation(Function):
     @typechecked
     def is_compatible_with(self, rel: Relation) -> Term:
         if rel.arity == 0:
-            return Term(BOOLEAN, "$true")
+            return TRUE
         elif self.arity == 0:
             val = self()
             return rel(*[val for _ in range(rel.arity)])
@@ -82,24 +82,15 @@ class Operation(Function):
         return self.domain.forall(test, num_args=self.arity * rel.arity)
 
     @typechecked
-    def has_values(self, table: List[Optional[Term]]) -> Term:
+    def has_values(self, table: Any) -> Term:
+        # the values are elements of the domain or their indices
         assert isinstance(self.domain, FixedDom)
         elems = self.domain.elems
-        assert len(table) == len(elems) ** self.arity
-        assert all(t.domain == self.domain for t in table)
-
-        claims = []
-        for idx, val in enumerate(table):
-            if val is None:
-                continue
-
-            coord = []
-            for _ in range(self.arity):
-                coord.append(elems[idx % len(elems)])
-                idx //= len(elems)
-            coord.reverse()
-            claims.append(self(*coord) == val)
+        values = table_values(table)
+        assert len(values) == len(self.cells)
 
+        claims = [cell == (val if isinstance(val, Term) else elems[val])
+                  for cell, val in zip(self.cells, values) if val is not None]
         return Term.all(claims)
 
 
@@ -0,0 +1,132 @@
+# Copyright (C) 2024, Miklos Maroti
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Iterable, Iterator, Optional, Tuple, TypeVar
+
+A = TypeVar("A")
+B = TypeVar("B")
+
+
+def num_jobs(jobs: Optional[int] = None) -> int:
+    if jobs is None or jobs <= 0:
+        jobs = os.cpu_count() or 1
+    return jobs
+
+
+def map_parallel(function: Callable[[A], B], items: Iterable[A],
+                 jobs: Optional[int] = None,
+                 ordered: bool = True) -> Iterator[Tuple[int, B]]:
+    # The solver runs in a child process, so threads keep all cores busy.
+    # At most 2 * jobs items are in flight, so items can be a generator.
+    jobs = num_jobs(jobs)
+    items = iter(items)
+
+    executor = ThreadPoolExecutor(max_workers=jobs)
+    try:
+        pending = {}
+        finished = {}
+        next_submit = 0
+        next_yield = 0
+        exhausted = False
+
+        while True:
+            while not exhausted and len(pending) < 2 * jobs:
+                try:
+                    item = next(items)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending[executor.submit(function, item)] = next_submit
+                next_submit += 1
+
+            if not pending and not finished:
+                return
+
+            if pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    finished[pending.pop(future)] = future.result()
+
+            if ordered:
+                while next_yield in finished:
+                    yield next_yield, finished.pop(next_yield)
+                    next_yield += 1
+            else:
+                for index in sorted(finished):
+                    yield index, finished.pop(index)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def merge_parallel(generator: Callable[[A], Iterable[B]], items: Iterable[A],
+                   jobs: Optional[int] = None) -> Iterator[B]:
+    # Runs the generator on each item on a pool of at most jobs worker
+    # threads and yields the produced values as soon as they are available.
+    jobs = num_jobs(jobs)
+    items = iter(items)
+    lock = threading.Lock()
+    stop = threading.Event()
+    results = queue.Queue(maxsize=16 * jobs)
+
+    def put(value) -> bool:
+        while not stop.is_set():
+            try:
+                results.put(value, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def worker():
+        try:
+            while not stop.is_set():
+                with lock:
+                    item = next(items, _DONE)
+                if item is _DONE:
+                    break
+                for value in generator(item):
+                    if not put((value, None)):
+                        return
+        except BaseException as error:
+            put((_DONE, error))
+            return
+        put((_DONE, None))
+
+    threads = [threading.Thread(target=worker, daemon=True)
+               for _ in range(jobs)]
+    for thread in threads:
+        thread.start()
+
+    try:
+        running = len(threads)
+        while running:
+            value, error = results.get()
+            if error is not None:
+                raise error
+            elif value is _DONE:
+                running -= 1
+            else:
+                yield value
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+
+_DONE = object()
@@ -0,0 +1,121 @@
+# Copyright (C) 2024, Miklos Maroti
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from typeguard import typechecked
+
+from .limits import Budget, ResourceOut
+from .problem import Problem
+
+Strategy = Tuple[str, ...]
+
+
+class Portfolio:
+    """
+    Races several solver option vectors on the same problem at once. The
+    first strategy that finishes with a conclusive answer (a model, or no
+    model) wins and the others are killed. Strategies that run out of
+    resources or fail only lose. The number of wins of each strategy is
+    counted per problem family, and saved to a JSON file if one is given,
+    so the best strategies can be tried first or used as the default.
+    """
+
+    STRATEGIES: List[Strategy] = [
+        Problem.FMB_OPTIONS,
+        Problem.FMB_OPTIONS + ("-fmbes", "contour"),
+        Problem.FMB_OPTIONS + ("-fmbsso", "input_usage"),
+        Problem.FMB_OPTIONS + ("-fmbswr", "0"),
+        Problem.FMB_OPTIONS + ("-fmbas", "off"),
+    ]
+
+    @typechecked
+    def __init__(self, strategies: Optional[Sequence[Sequence[str]]] = None,
+                 path: Optional[str] = None):
+        self.strategies = [tuple(s) for s in (
+            strategies if strategies is not None else Portfolio.STRATEGIES)]
+        self.path = path
+        self.lock = threading.Lock()
+        self.wins: Dict[str, Dict[str, int]] = {}
+        if path is not None and os.path.exists(path):
+            with open(path) as file:
+                self.wins = json.load(file)
+
+    @typechecked
+    def record(self, family: str, strategy: Strategy):
+        with self.lock:
+            wins = self.wins.setdefault(family, {})
+            key = " ".join(strategy)
+            wins[key] = wins.get(key, 0) + 1
+            if self.path is not None:
+                with open(self.path + ".tmp", "w") as file:
+                    json.dump(self.wins, file, indent=2)
+                os.replace(self.path + ".tmp", self.path)
+
+    @typechecked
+    def ranked(self, family: str) -> List[Strategy]:
+        # The strategies with the most wins in the family first.
+        with self.lock:
+            wins = dict(self.wins.get(family, {}))
+        return sorted(self.strategies,
+                      key=lambda s: -wins.get(" ".join(s), 0))
+
+    @typechecked
+    def find_one_model(self, problem: Problem, family: str = "default",
+                       jobs: Optional[int] = None,
+                       budget: Optional[Budget] = None,
+                       ) -> Tuple[Optional[Dict[str, Any]], Strategy]:
+        # Returns the answer and the winning strategy. If jobs is given,
+        # then only that many of the strategies with the most wins race.
+        # Raises ResourceOut if none of them was conclusive.
+        strategies = self.ranked(family)
+        if jobs is not None and jobs > 0:
+            strategies = strategies[:jobs]
+        parent = budget if budget is not None else Budget()
+        budgets = [parent.child() for _ in strategies]
+
+        def run(idx: int) -> Optional[Dict[str, Any]]:
+            return problem.find_one_model(
+                budget=budgets[idx], options=strategies[idx])
+
+        failure = None
+        with ThreadPoolExecutor(max_workers=len(strategies)) as executor:
+            pending = {executor.submit(run, idx): idx
+                       for idx in range(len(strategies))}
+            try:
+                while pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        idx = pending.pop(future)
+                        try:
+                            result = future.result()
+                        except ResourceOut:
+                            continue
+                        except RuntimeError as error:
+                            failure = error
+                            continue
+
+                        self.record(family, strategies[idx])
+                        return result, strategies[idx]
+            finally:
+                for other in budgets:
+                    other.cancel()
+
+        if failure is not None:
+            raise failure
+        raise ResourceOut("no strategy was conclusive")
@@ -13,24 +13,50 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import asyncio
+import collections
+import contextlib
+import hashlib
+import itertools
 import re
 import subprocess
-from typing import Dict, List, Iterator, Any, Optional
+import time
+from typing import AsyncIterator, ContextManager, Dict, List, Iterator, Any, \
+    Optional, Tuple
 from typeguard import typechecked
 
-from .domain import Domain, Term, BOOLEAN
+from .domain import Domain, Term, BOOLEAN, FixedDom, AND, TRUE
 from .relation import Relation
 from .operation import Operation
 from .function import Function
+from .lexord import ORDDOM, OrdCmp, lex_less_equal
+from .blocking import BlockingTrie
+from .cache import SolverCache
+from .cnf import Cnf
+from .engine import Engine
+from .limits import Budget, ResourceOut, kill_process, wait_process
+from .model import ModelParser
+from .observer import Observer, SolverCall, Enumeration
+from .statistics import SolverStatistics
+from .parallel import map_parallel, merge_parallel, num_jobs
+from .profile import Profile
 
 
 class Problem:
-    def __init__(self):
+    default_cache: Optional[SolverCache] = None
+    profile: Optional[Profile] = None
+    observers: List[Observer] = []
+
+    def __init__(self, cache: Optional[SolverCache] = None):
         self.domains: Dict[str, Domain] = {}
         self.relations: Dict[str, Relation] = {}
         self.operations: Dict[str, Operation] = {}
         self.functions: Dict[str, Operation] = {}
         self.lines: List[str] = []
+        self.data = bytearray()
+        self.digest = hashlib.sha256()
+        self.axioms = 0
+        self.cache = cache if cache is not None else Problem.default_cache
 
     @typechecked
     def declare(self, obj: Domain | Relation | Operation | Function):
@@ -50,230 +76,712 @@ class Problem:
             raise ValueError()
 
         for line in obj.declare():
-            self.lines.append(line)
+            self.append(line)
+
+    def append(self, line: str):
+        # the encoded input is kept up to date, so solver calls do not
+        # need to join and encode the lines again
+        data = line.encode() + b"\n"
+        self.lines.append(line)
+        self.data += data
+        self.digest.update(data)
 
     @typechecked
     def require(self, formula: Term):
         assert formula.domain == BOOLEAN
-        value = formula.value
-        if value.startswith("(") and value.endswith(")"):
-            value = value[1:-1]
-        name = "axiom" + str(len(self.lines))
-        self.lines.append(f"tff({name}, axiom, {value}).")
+        # conjuncts become separate axioms, so ground facts are units
+        claims = formula.args if formula.op == AND else \
+            () if formula is TRUE else (formula, )
+        with Problem.phase("render"):
+            for claim in claims:
+                value = claim.render(top=True)
+                name = "axiom" + str(len(self.lines))
+                self.append(f"tff({name}, axiom, {value}).")
+                self.axioms += 1
+
+    @staticmethod
+    def phase(name: str) -> ContextManager[None]:
+        if Problem.profile is None:
+            return contextlib.nullcontext()
+        return Problem.profile.phase(name)
+
+    def observe(self, backend: str,
+                options: Tuple[str, ...]) -> Optional[SolverCall]:
+        if not Problem.observers:
+            return None
+        return SolverCall(backend, options, len(self.data), self.axioms)
+
+    @staticmethod
+    def notify(method: str, event: SolverCall | Enumeration):
+        for observer in Problem.observers:
+            getattr(observer, method)(event)
+
+    @staticmethod
+    @contextlib.contextmanager
+    def observing(event: Optional[SolverCall]) -> Iterator[None]:
+        if event is None:
+            yield
+            return
+
+        start = time.perf_counter()
+        thread_time = time.thread_time()
+        try:
+            yield
+        except Exception as error:
+            event.error = type(error).__name__
+            raise
+        finally:
+            event.wall_time = time.perf_counter() - start
+            if event.backend != "vampire":
+                event.cpu_time = time.thread_time() - thread_time
+                event.max_rss = None
+            Problem.notify("solver_call", event)
 
     def print(self):
         for line in self.lines:
             print(line)
 
-    @typechecked
-    def execute(self, *options: str) -> str:
-        input = "\n".join(self.lines)
-        result: subprocess.CompletedProcess = subprocess.run(
-            args=("vampire-3b8b5760", ) + options,
-            input=input,
+    SOLVER = "vampire-3b8b5760"
+
+    def stream(self, *options: str,
+               budget: Optional[Budget] = None,
+               event: Optional[SolverCall] = None) -> Iterator[str]:
+        with Problem.phase("solver"):
+            if self.cache is None:
+                yield from self.run_solver(*options, budget=budget,
+                                           event=event)
+                return
+
+            key = SolverCache.key(
+                Problem.SOLVER, options, self.digest.hexdigest())
+            output = self.cache.get(key)
+            if output is not None:
+                if event is not None:
+                    event.cached = True
+                    event.output_bytes = len(output)
+                yield from output.splitlines(keepends=True)
+                return
+
+            lines = []
+            for line in self.run_solver(*options, budget=budget,
+                                        event=event):
+                lines.append(line)
+                yield line
+            self.cache.put(key, "".join(lines))
+
+    RE_RESOURCE_OUT = re.compile(
+        r"^% (Time limit reached|Memory limit exceeded)"
+        r"|SZS status (Timeout|MemoryOut|ResourceOut|GaveUp|Unknown)")
+
+    def run_solver(self, *options: str,
+                   budget: Optional[Budget] = None,
+                   event: Optional[SolverCall] = None) -> Iterator[str]:
+        if budget is not None and budget.exhausted:
+            raise ResourceOut("budget exhausted")
+        if Problem.profile is not None:
+            Problem.profile.solver_call(len(self.data))
+
+        process = subprocess.Popen(
+            args=(Problem.SOLVER, ) + options,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
             text=True,
-            capture_output=True,
+            start_new_session=True,
         )
-        if result.returncode:
-            print(result.stdout)
-            raise RuntimeError(f"failed with {result.returncode} error code")
-        return result.stdout
-
-    RE_STATEMENT = re.compile(
-        r"^tff\(([\w\s]*),([\w\s]*),([^.]*)\)\.$", flags=re.MULTILINE | re.DOTALL)
-    RE_REMOVE_COMMENT = re.compile(r"^%.*$", flags=re.MULTILINE)
-    RE_REMOVE_SPACE = re.compile(r"\s")
-    RE_DOMAIN_DECL = re.compile(r"^(\w*):\$tType$")
-    RE_PREDICATE_DECL = re.compile(r"^(\w*):(?:|\((.*)\)>)\$o$")
-    RE_FUNCTION_DECL = re.compile(r"^(\w*):(?:|\((.*)\)>)(\w*)$")
-    RE_FINITE_DOM = re.compile(r"^!\[X:(\w*)\]:\((.*)\)$")
+        usage = None
+        try:
+            if budget is not None:
+                budget.register(process)
+
+            try:
+                with memoryview(self.data) as data:
+                    process.stdin.buffer.write(data)
+                process.stdin.close()
+            except BrokenPipeError:
+                pass
+
+            tail = collections.deque(maxlen=100)
+            resource_out = None
+            for line in process.stdout:
+                tail.append(line)
+                if line.startswith("%"):
+                    match = Problem.RE_RESOURCE_OUT.search(line)
+                    if match:
+                        resource_out = match.group(0)
+                if event is not None:
+                    event.output_bytes += len(line)
+                yield line
+
+            usage = wait_process(process, budget)
+            if budget is not None:
+                stopped = budget.unregister(
+                    process, usage.ru_utime + usage.ru_stime)
+                budget = None
+                if stopped:
+                    raise ResourceOut("solver stopped by budget")
+            if resource_out is not None:
+                raise ResourceOut(resource_out)
+            elif process.returncode:
+                print("".join(tail), end="")
+                raise RuntimeError(
+                    f"failed with {process.returncode} error code")
+        finally:
+            if usage is None:
+                kill_process(process)
+                usage = wait_process(process, budget)
+            if budget is not None:
+                budget.unregister(process, usage.ru_utime + usage.ru_stime)
+            if event is not None:
+                event.cpu_time = usage.ru_utime + usage.ru_stime
+                event.max_rss = usage.ru_maxrss * 1024
+            process.stdout.close()
 
     @typechecked
-    def find_one_model(self) -> Optional[Dict[str, Any]]:
-        result = self.execute("-sa", "fmb", "-fde", "none")
-        if not "Finite Model Found!" in result:
-            return None
+    def execute(self, *options: str, budget: Optional[Budget] = None) -> str:
+        event = self.observe("vampire", options)
+        with Problem.observing(event):
+            return "".join(self.stream(*options, budget=budget, event=event))
 
-        domains: Dict[str, List[str]] = {}
-        predicates = {}
-        functions = {}
-
-        for match in Problem.RE_STATEMENT.finditer(result):
-            formula = Problem.RE_REMOVE_COMMENT.sub("", match.group(3))
-            formula = Problem.RE_REMOVE_SPACE.sub("", formula)
-            # print(">" + formula + "<")
-
-            if match.group(2) == "type":
-                match2 = Problem.RE_DOMAIN_DECL.match(formula)
-                if match2:
-                    name = match2.group(1)
-                    assert name not in domains
-                    domains[name] = []
-                    continue
-
-                match2 = Problem.RE_PREDICATE_DECL.match(formula)
-                if match2:
-                    name = match2.group(1)
-                    doms = match2.group(2)
-                    if doms is None:
-                        doms = []
-                    else:
-                        doms = doms.split("*")
-                    size = 1
-                    for dom in doms:
-                        size *= len(domains[dom])
-                    assert name not in predicates
-                    predicates[name] = {
-                        "domains": doms,
-                        "table": [None for _ in range(size)],
-                    }
-                    continue
-
-                match2 = Problem.RE_FUNCTION_DECL.match(formula)
-                if match2:
-                    name = match2.group(1)
-                    doms = match2.group(2)
-                    codom = match2.group(3)
-                    if doms is None:
-                        doms = []
+    @staticmethod
+    @typechecked
+    def execute_many(problems: List['Problem'], *options: str,
+                     jobs: Optional[int] = None,
+                     ordered: bool = True,
+                     budget: Optional[Budget] = None,
+                     ) -> Iterator[Tuple[int, str]]:
+        return map_parallel(lambda prob: prob.execute(*options, budget=budget),
+                            problems, jobs=jobs, ordered=ordered)
+
+    FMB_OPTIONS = ("-sa", "fmb", "-fde", "none")
+
+    BACKENDS = ("vampire", "native", "sat")
+    BLOCKINGS = ("clause", "trie")
+
+    def finder(self, backend: str,
+               budget: Optional[Budget] = None) -> Engine | Cnf:
+        # The in-process model finders for FixedDom problems.
+        if Problem.profile is not None:
+            Problem.profile.solver_call(len(self.data))
+        if backend == "native":
+            return Engine(self, budget=budget)
+        assert backend == "sat"
+        return Cnf(self, budget=budget)
+
+    @typechecked
+    def find_one_model(self, backend: str = "vampire",
+                       budget: Optional[Budget] = None,
+                       statistics: bool = False,
+                       options: Tuple[str, ...] = FMB_OPTIONS,
+                       ) -> Optional[Dict[str, Any]]:
+        # With statistics the solver statistics are attached to the model
+        # and to the observed event under the statistics key.
+        assert backend == "vampire" or not statistics
+        stats = None
+        if statistics:
+            options += SolverStatistics.OPTIONS
+            stats = SolverStatistics()
+
+        event = self.observe(backend, options if backend == "vampire" else ())
+        with Problem.observing(event):
+            if backend != "vampire":
+                with Problem.phase("solver"):
+                    result = self.finder(backend, budget).find_one_model()
+            else:
+                result = self.parse_stream(
+                    self.stream(*options, budget=budget, event=event),
+                    event, stats)
+            if event is not None:
+                event.model_found = result is not None
+                event.statistics = stats
+            if result is not None and stats is not None:
+                result["statistics"] = stats
+            return result
+
+    @staticmethod
+    def parse_stream(lines: Iterator[str], event: Optional[SolverCall],
+                     statistics: Optional[SolverStatistics] = None,
+                     ) -> Optional[Dict[str, Any]]:
+        parser = ModelParser()
+        for line in lines:
+            with Problem.phase("parse"):
+                if event is not None:
+                    start = time.perf_counter()
+                parser.feed(line)
+                if statistics is not None:
+                    statistics.feed(line)
+                if event is not None:
+                    event.parse_time += time.perf_counter() - start
+        with Problem.phase("parse"):
+            return parser.result()
+
+    @staticmethod
+    @typechecked
+    def find_one_model_many(problems: List['Problem'],
+                            jobs: Optional[int] = None,
+                            ordered: bool = True,
+                            budget: Optional[Budget] = None,
+                            backend: str = "vampire",
+                            ) -> Iterator[Tuple[int, Optional[Dict[str, Any]]]]:
+        return map_parallel(
+            lambda prob: prob.find_one_model(backend=backend, budget=budget),
+            problems, jobs=jobs, ordered=ordered)
+
+    @staticmethod
+    def limited(limiter: Optional[asyncio.Semaphore]
+                ) -> contextlib.AbstractAsyncContextManager:
+        return limiter if limiter is not None else contextlib.nullcontext()
+
+    async def stream_async(self, *options: str,
+                           budget: Optional[Budget] = None,
+                           limiter: Optional[asyncio.Semaphore] = None,
+                           event: Optional[SolverCall] = None,
+                           ) -> AsyncIterator[str]:
+        # The limiter bounds the number of solver processes running at the
+        # same time, the slot is held until the output is consumed.
+        async with Problem.limited(limiter):
+            if self.cache is None:
+                async for line in self.run_solver_async(
+                        *options, budget=budget, event=event):
+                    yield line
+                return
+
+            key = SolverCache.key(
+                Problem.SOLVER, options, self.digest.hexdigest())
+            output = self.cache.get(key)
+            if output is not None:
+                if event is not None:
+                    event.cached = True
+                    event.output_bytes = len(output)
+                for line in output.splitlines(keepends=True):
+                    yield line
+                return
+
+            lines = []
+            async for line in self.run_solver_async(
+                    *options, budget=budget, event=event):
+                lines.append(line)
+                yield line
+            self.cache.put(key, "".join(lines))
+
+    CHUNK_SIZE = 1 << 16
+
+    async def run_solver_async(self, *options: str,
+                               budget: Optional[Budget] = None,
+                               event: Optional[SolverCall] = None,
+                               ) -> AsyncIterator[str]:
+        if budget is not None and budget.exhausted:
+            raise ResourceOut("budget exhausted")
+
+        process = await asyncio.create_subprocess_exec(
+            Problem.SOLVER, *options,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+            limit=1 << 24,
+        )
+        finished = False
+        try:
+            if budget is not None:
+                budget.register(process)
+
+            try:
+                with memoryview(self.data) as data:
+                    for start in range(0, len(data), Problem.CHUNK_SIZE):
+                        process.stdin.write(
+                            data[start:start + Problem.CHUNK_SIZE])
+                        await process.stdin.drain()
+                process.stdin.close()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+            tail = collections.deque(maxlen=100)
+            resource_out = None
+            async for line in process.stdout:
+                line = line.decode()
+                tail.append(line)
+                if line.startswith("%"):
+                    match = Problem.RE_RESOURCE_OUT.search(line)
+                    if match:
+                        resource_out = match.group(0)
+                if event is not None:
+                    event.output_bytes += len(line)
+                yield line
+
+            await process.wait()
+            finished = True
+
+            # the event loop reaps the process, so its CPU time is unknown
+            if budget is not None:
+                stopped = budget.unregister(process, 0.0)
+                budget = None
+                if stopped:
+                    raise ResourceOut("solver stopped by budget")
+            if resource_out is not None:
+                raise ResourceOut(resource_out)
+            elif process.returncode:
+                print("".join(tail), end="")
+                raise RuntimeError(
+                    f"failed with {process.returncode} error code")
+        finally:
+            if not finished:
+                kill_process(process)
+                await process.wait()
+            if budget is not None:
+                budget.unregister(process, 0.0)
+
+    @typechecked
+    async def execute_async(self, *options: str,
+                            budget: Optional[Budget] = None,
+                            limiter: Optional[asyncio.Semaphore] = None,
+                            ) -> str:
+        event = self.observe("vampire", options)
+        with Problem.observing(event):
+            lines = []
+            async for line in self.stream_async(*options, budget=budget,
+                                                limiter=limiter, event=event):
+                lines.append(line)
+            return "".join(lines)
+
+    @typechecked
+    async def find_one_model_async(self, backend: str = "vampire",
+                                   budget: Optional[Budget] = None,
+                                   limiter: Optional[asyncio.Semaphore] = None,
+                                   statistics: bool = False,
+                                   options: Tuple[str, ...] = FMB_OPTIONS,
+                                   ) -> Optional[Dict[str, Any]]:
+        if backend != "vampire":
+            loop = asyncio.get_running_loop()
+            async with Problem.limited(limiter):
+                return await loop.run_in_executor(
+                    None, self.find_one_model, backend, budget, statistics,
+                    options)
+        assert backend == "vampire"
+
+        stats = None
+        if statistics:
+            options += SolverStatistics.OPTIONS
+            stats = SolverStatistics()
+
+        event = self.observe(backend, options)
+        with Problem.observing(event):
+            parser = ModelParser()
+            async for line in self.stream_async(
+                    *options, budget=budget, limiter=limiter, event=event):
+                if event is None:
+                    parser.feed(line)
+                else:
+                    start = time.perf_counter()
+                    parser.feed(line)
+                    event.parse_time += time.perf_counter() - start
+                if stats is not None:
+                    stats.feed(line)
+            result = parser.result()
+            if event is not None:
+                event.model_found = result is not None
+                event.statistics = stats
+            if result is not None and stats is not None:
+                result["statistics"] = stats
+            return result
+
+    @staticmethod
+    @typechecked
+    def parse_model(result: str) -> Optional[Dict[str, Any]]:
+        parser = ModelParser()
+        for line in result.splitlines():
+            parser.feed(line)
+        return parser.result()
+
+    @typechecked
+    def has_values(self, name: str, table: Any) -> Term:
+        if name in self.relations:
+            return self.relations[name].has_values(table)
+        elif name in self.operations:
+            return self.operations[name].has_values(table)
+        else:
+            raise ValueError()
+
+    @typechecked
+    def break_symmetries(self, names: List[str], complete: bool = True):
+        # Requires that the tables of the given names, all over the same
+        # FixedDom, are lexicographically minimal among their isomorphic
+        # copies, for all permutations of the domain if complete is set
+        # and for the adjacent transpositions otherwise. In the complete
+        # case every isomorphism class has exactly one model. The axioms
+        # must be invariant under the permutations of the domain, so no
+        # fixed tables or elements, and the names must include every
+        # symbol of the models, otherwise models are lost.
+        objs = [self.relations[name] if name in self.relations
+                else self.operations[name] for name in names]
+        if not objs:
+            return
+        dom = objs[0].domain
+        assert isinstance(dom, FixedDom)
+        assert all(obj.domain == dom for obj in objs)
+
+        cmp = None
+        if any(isinstance(obj, Operation) for obj in objs):
+            if str(ORDDOM) not in self.domains:
+                self.declare(ORDDOM)
+            cmp = self.functions.get(f"{dom}_cmp")
+            if cmp is None:
+                cmp = OrdCmp(dom)
+                self.declare(cmp)
+
+        size = dom.size
+        if complete:
+            perms = list(itertools.permutations(range(size)))[1:]
+        else:
+            perms = []
+            for i in range(size - 1):
+                perm = list(range(size))
+                perm[i], perm[i + 1] = perm[i + 1], perm[i]
+                perms.append(tuple(perm))
+
+        for perm in perms:
+            inv = [None] * size
+            for i, j in enumerate(perm):
+                inv[j] = i
+
+            permop = None
+            if cmp is not None:
+                name = f"{dom}_perm_" + "_".join(str(i) for i in perm)
+                permop = self.operations.get(name)
+                if permop is None:
+                    permop = Operation(name, dom, 1)
+                    self.declare(permop)
+                    self.require(self.has_values(name, list(perm)))
+
+            pairs = []
+            for obj in objs:
+                for coord in itertools.product(range(size), repeat=obj.arity):
+                    coord2 = [inv[i] for i in coord]
+                    value = obj(*[dom.elems[i] for i in coord])
+                    value2 = obj(*[dom.elems[i] for i in coord2])
+                    if isinstance(obj, Relation):
+                        if list(coord) != coord2:
+                            pairs.append((value, value2))
                     else:
-                        doms = doms.split("*")
-                    size = 1
-                    for dom in doms:
-                        size *= len(domains[dom])
-                    assert name not in functions
-                    functions[name] = {
-                        "domains": doms,
-                        "codomain": codom,
-                        "table": [None for _ in range(size)],
-                    }
-
-            elif match.group(1).startswith("finite_domain_") and match.group(2) == "axiom":
-                name = match.group(1)[14:]
-                match2 = Problem.RE_FINITE_DOM.match(formula)
-                assert name == match2.group(1) and domains[name] == []
-                dom = domains[name]
-                for idx, elem in enumerate(match2.group(2).split("|")):
-                    assert elem.startswith("X=")
-                    elem = elem[2:]
-                    dom.append(elem)
-                    fun = functions[elem]
-                    assert fun["domains"] == [] and fun["codomain"] == name
-                    assert fun["table"][0] is None
-                    fun["table"][0] = idx
-                continue
-
-            elif match.group(1).startswith("predicate_") and match.group(2) == "axiom":
-                name = match.group(1)[10:]
-                doms = predicates[name]["domains"]
-                table = predicates[name]["table"]
-                if formula:
-                    for atom in formula.split("&"):
-                        negated = atom.startswith("~")
-                        if negated:
-                            atom = atom[1:]
-                        assert atom.startswith(
-                            name + "(") and atom.endswith(")")
-                        atom = atom[len(name) + 1:-1]
-                        elems = atom.split(",")
-                        assert len(elems) == len(doms)
-                        idx = 0
-                        for dom, elem in zip(doms, elems):
-                            idx *= len(domains[dom])
-                            idx += domains[dom].index(elem)
-                        assert table[idx] is None
-                        table[idx] = not negated
-                continue
-
-            elif match.group(1).startswith("function_") and match.group(2) == "axiom":
-                name = match.group(1)[9:]
-                doms = functions[name]["domains"]
-                table = functions[name]["table"]
-                codom = domains[functions[name]["codomain"]]
-                for atom in formula.split("&"):
-                    left, right = atom.split("=")
-                    assert right in codom
-                    assert left.startswith(name + "(") and left.endswith(")")
-                    left = left[len(name) + 1:-1]
-                    elems = left.split(",")
-                    assert len(elems) == len(doms)
-                    idx = 0
-                    for dom, elem in zip(doms, elems):
-                        idx *= len(domains[dom])
-                        idx += domains[dom].index(elem)
-                    assert table[idx] is None
-                    table[idx] = codom.index(right)
-                continue
-
-            elif match.group(1).endswith("_definition") and match.group(2) == "axiom":
-                name = match.group(1)[:-11]
-                if name in predicates:
-                    assert formula == name or formula == "~" + name
-                    predicate = predicates[name]
-                    assert predicate["domains"] == []
-                    table = predicate["table"]
-                    assert len(table) == 1 and table[0] is None
-                    table[0] = formula == name
-                elif name in functions:
-                    left, right = formula.split("=")
-                    assert left == name
-                    fun = functions[left]
-                    assert fun["domains"] == [] and fun["table"][0] is None
-                    codom = domains[fun["codomain"]]
-                    assert right in codom
-                    fun["table"][0] = codom.index(right)
-
-        return {
-            "domains": domains,
-            "predicates": predicates,
-            "functions": functions,
-        }
+                        pairs.append((value, permop(value2)))
+            self.require(lex_less_equal(pairs, cmp))
 
     @typechecked
-    def yield_all_models(self, names: List[str]) -> Iterator[Dict[str, Any]]:
+    def projection(self, result: Dict[str, Any], names: List[str],
+                   ) -> Tuple[Dict[str, Any], List[Term]]:
+        # Returns the tables of the given names in the model and the
+        # claims that the tables have these values.
+        result2 = {}
+        omits = []
+        for name in names:
+            if name in self.relations:
+                table = result["predicates"][name]["table"]
+            elif name in self.operations:
+                table = result["functions"][name]["table"]
+            else:
+                raise ValueError()
+            result2[name] = table
+            omits.append(self.has_values(name, table))
+        return result2, omits
+
+    @typechecked
+    def yield_all_models(self, names: List[str], jobs: int = 1,
+                         backend: str = "vampire",
+                         budget: Optional[Budget] = None,
+                         blocking: str = "clause",
+                         ) -> Iterator[Dict[str, Any]]:
+        # If the budget runs out, then the enumeration stops early and
+        # budget.exhausted is set. The found models are blocked by one
+        # axiom each, or with a shared trie if blocking is trie. With
+        # clauses the native and sat backends block inside their search,
+        # the trie is added to the problem and solved again by all.
         for name in names:
             assert name in self.relations or name in self.operations
+        assert blocking in Problem.BLOCKINGS
+
+        models = self.enumerate_models(names, jobs, backend, budget,
+                                       blocking)
+        if not Problem.observers:
+            return models
+        event = Enumeration(backend, names, jobs, len(self.data), self.axioms)
+        return self.observe_models(models, event)
+
+    def observe_models(self, models: Iterator[Dict[str, Any]],
+                       event: Enumeration) -> Iterator[Dict[str, Any]]:
+        lines = len(self.lines)
+        size = len(self.data)
+        start = time.perf_counter()
+        try:
+            for model in models:
+                event.models += 1
+                yield model
+        except Exception as error:
+            event.error = type(error).__name__
+            raise
+        finally:
+            event.wall_time = time.perf_counter() - start
+            event.blocking_clauses = len(self.lines) - lines
+            event.blocking_bytes = len(self.data) - size
+            Problem.notify("enumeration", event)
 
-        while True:
-            result = self.find_one_model()
-            if result is None:
+    def enumerate_models(self, names: List[str], jobs: int, backend: str,
+                         budget: Optional[Budget], blocking: str,
+                         ) -> Iterator[Dict[str, Any]]:
+        try:
+            if jobs != 1 and names:
+                yield from self.yield_all_models_parallel(
+                    names, jobs, backend=backend, budget=budget,
+                    blocking=blocking)
                 return
+            elif backend != "vampire" and blocking == "clause":
+                with Problem.phase("solver"):
+                    yield from self.finder(
+                        backend, budget).yield_all_models(names)
+                return
+
+            trie = BlockingTrie(self) if blocking == "trie" else None
+            while True:
+                result = self.find_one_model(backend=backend, budget=budget)
+                if result is None:
+                    return
+
+                result2, omits = self.projection(result, names)
+                yield result2
+                if not omits:
+                    return
 
-            result2 = {}
-            omits = []
-            for name in names:
-                if name in self.relations:
-                    rel = self.relations[name]
-                    pred = result["predicates"][name]
-                    table = pred["table"]
-                    result2[name] = table
-                    omits.append(rel.has_values(table))
-                elif name in self.operations:
-                    oper = self.operations[name]
-                    func = result["functions"][name]
-                    table = func["table"]
-                    result2[name] = table
-                    table = [oper.domain.elems[t] for t in table]
-                    omits.append(oper.has_values(table))
+                if trie is None:
+                    self.require(~Term.all(omits))
                 else:
-                    raise ValueError()
+                    trie.block(omits)
+        except ResourceOut:
+            if budget is None or not budget.exhausted:
+                raise
 
-            yield result2
-            if not omits:
-                return
+    async def yield_all_models_async(self, names: List[str],
+                                     backend: str = "vampire",
+                                     budget: Optional[Budget] = None,
+                                     limiter: Optional[asyncio.Semaphore] = None,
+                                     ) -> AsyncIterator[Dict[str, Any]]:
+        for name in names:
+            assert name in self.relations or name in self.operations
+
+        try:
+            if backend != "vampire":
+                loop = asyncio.get_running_loop()
+                async with Problem.limited(limiter):
+                    finder = await loop.run_in_executor(
+                        None, self.finder, backend, budget)
+                models = finder.yield_all_models(names)
+                while True:
+                    async with Problem.limited(limiter):
+                        result = await loop.run_in_executor(
+                            None, next, models, None)
+                    if result is None:
+                        return
+                    yield result
+
+            while True:
+                result = await self.find_one_model_async(
+                    backend=backend, budget=budget, limiter=limiter)
+                if result is None:
+                    return
 
-            self.require(~Term.all(omits))
+                result2, omits = self.projection(result, names)
+                yield result2
+                if not omits:
+                    return
+
+                self.require(~Term.all(omits))
+        except ResourceOut:
+            if budget is None or not budget.exhausted:
+                raise
+
+    @typechecked
+    def copy(self) -> 'Problem':
+        prob = Problem(cache=self.cache)
+        prob.domains = dict(self.domains)
+        prob.relations = dict(self.relations)
+        prob.operations = dict(self.operations)
+        prob.functions = dict(self.functions)
+        prob.lines = list(self.lines)
+        prob.data = bytearray(self.data)
+        prob.digest = self.digest.copy()
+        prob.axioms = self.axioms
+        return prob
+
+    @typechecked
+    def yield_cubes(self, names: List[str],
+                    num_cubes: int) -> Iterator['Problem']:
+        cells = []
+        sizes = {}
+        for name in names:
+            if name in self.relations:
+                rel = self.relations[name]
+                assert isinstance(rel.domain, FixedDom)
+                sizes[name] = rel.domain.size ** rel.arity
+                values = [False, True]
+            elif name in self.operations:
+                oper = self.operations[name]
+                assert isinstance(oper.domain, FixedDom)
+                sizes[name] = oper.domain.size ** oper.arity
+                values = list(range(oper.domain.size))
+            else:
+                raise ValueError()
+            cells.extend((name, idx, values) for idx in range(sizes[name]))
+
+        depth = 0
+        count = 1
+        while depth < len(cells) and count < num_cubes:
+            count *= len(cells[depth][2])
+            depth += 1
+        cells = cells[:depth]
+
+        for values in itertools.product(*[cell[2] for cell in cells]):
+            tables = {}
+            for (name, idx, _), value in zip(cells, values):
+                if name not in tables:
+                    tables[name] = [None] * sizes[name]
+                tables[name][idx] = value
+
+            prob = self.copy()
+            for name, table in tables.items():
+                prob.require(prob.has_values(name, table))
+            yield prob
+
+    @typechecked
+    def yield_all_models_parallel(self, names: List[str],
+                                  jobs: Optional[int] = None,
+                                  cubes_per_job: int = 4,
+                                  backend: str = "vampire",
+                                  budget: Optional[Budget] = None,
+                                  blocking: str = "clause",
+                                  ) -> Iterator[Dict[str, Any]]:
+        cubes = self.yield_cubes(names, num_jobs(jobs) * cubes_per_job)
+        return merge_parallel(
+            lambda prob: prob.yield_all_models(
+                names, backend=backend, budget=budget, blocking=blocking),
+            cubes, jobs=jobs)
 
     @typechecked
-    def find_all_models(self, names: List[str]) -> List[Dict[str, Any]]:
+    def find_all_models(self, names: List[str], jobs: int = 1,
+                        backend: str = "vampire",
+                        budget: Optional[Budget] = None,
+                        blocking: str = "clause",
+                        ) -> List[Dict[str, Any]]:
         results = []
-        for result in self.yield_all_models(names):
+        for result in self.yield_all_models(names, jobs=jobs, backend=backend,
+                                            budget=budget, blocking=blocking):
             results.append(result)
         return results
 
     @typechecked
-    def find_num_models(self, names: List[str]) -> int:
+    def find_num_models(self, names: List[str], jobs: int = 1,
+                        backend: str = "vampire",
+                        budget: Optional[Budget] = None,
+                        blocking: str = "clause") -> int:
         count = 0
-        for _ in self.yield_all_models(names):
+        for _ in self.yield_all_models(names, jobs=jobs, backend=backend,
+                                       budget=budget, blocking=blocking):
             count += 1
         return count
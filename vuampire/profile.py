@@ -0,0 +1,64 @@
+# Copyright (C) 2024, Miklos Maroti
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import contextlib
+import threading
+import time
+from typing import Dict, Iterator
+from typeguard import typechecked
+
+
+class Profile:
+    """
+    Accumulates the wall time spent in named phases, where entering a
+    phase pauses the enclosing one of the same thread, together with the
+    number of solver calls and the number of bytes written to them.
+    """
+
+    @typechecked
+    def __init__(self):
+        self.times: Dict[str, float] = {}
+        self.solver_calls = 0
+        self.input_bytes = 0
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def add(self, name: str, seconds: float):
+        with self.lock:
+            self.times[name] = self.times.get(name, 0.0) + seconds
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        stack = self.local.__dict__.setdefault("stack", [])
+        now = time.perf_counter()
+        if stack:
+            self.add(stack[-1][0], now - stack[-1][1])
+        entry = [name, now]
+        stack.append(entry)
+        try:
+            yield
+        finally:
+            # abandoned generators can exit their phases out of order
+            now = time.perf_counter()
+            top = stack[-1] is entry
+            stack.remove(entry)
+            self.add(name, now - entry[1])
+            if top and stack:
+                stack[-1][1] = now
+
+    def solver_call(self, input_bytes: int):
+        with self.lock:
+            self.solver_calls += 1
+            self.input_bytes += input_bytes
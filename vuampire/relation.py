@@ -13,11 +13,11 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-from typing import List, Optional
+from typing import Any
 from typeguard import typechecked
 
 from .domain import Domain, Term, BOOLEAN, FixedDom
-from .function import Function
+from .function import Function, table_values
 
 
 class Relation(Function):
@@ -65,24 +65,11 @@ class Relation(Function):
         return self.is_quasiorder() & self.is_symmetric()
 
     @typechecked
-    def has_values(self, table: List[Optional[bool]]) -> Term:
+    def has_values(self, table: Any) -> Term:
         assert isinstance(self.domain, FixedDom)
-        elems = self.domain.elems
-        assert len(table) == len(elems) ** self.arity
-
-        claims = []
-        for idx, val in enumerate(table):
-            if val is None:
-                continue
-
-            coord = []
-            for _ in range(self.arity):
-                coord.append(elems[idx % len(elems)])
-                idx //= len(elems)
-            coord.reverse()
-            claim = self(*coord)
-            if not val:
-                claim = ~claim
-            claims.append(claim)
+        values = table_values(table)
+        assert len(values) == len(self.cells)
 
+        claims = [cell if val else ~cell
+                  for cell, val in zip(self.cells, values) if val is not None]
         return Term.all(claims)
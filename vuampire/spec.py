@@ -0,0 +1,174 @@
+# Copyright (C) 2024, Miklos Maroti
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import click
+import itertools
+import json
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+from typeguard import typechecked, TypeCheckError
+
+from .domain import FixedDom, Term
+from .model import dump_model
+from .operation import Operation
+from .problem import Problem
+from .relation import Relation
+
+# An example spec of the 3-element semigroups up to isomorphism:
+#
+# {
+#   "domains": {"dom": 3},
+#   "operations": {"op": {"domain": "dom", "arity": 2}},
+#   "require": [{"property": "is_associative", "of": "op"}],
+#   "project": ["op"],
+#   "break_symmetries": true
+# }
+#
+# Requirements can also give "with" naming a relation for properties
+# like is_compatible_with, "table" for has_values, and "negate": true.
+
+
+@typechecked
+def load_spec(path: str) -> Dict[str, Any]:
+    if path.endswith(".toml"):
+        try:
+            import tomllib
+        except ImportError:
+            import tomli as tomllib
+        with open(path, "rb") as file:
+            return tomllib.load(file)
+    with open(path) as file:
+        return json.load(file)
+
+
+@typechecked
+def requirement(prob: Problem, req: Dict[str, Any]) -> Term:
+    name = req["of"]
+    if name in prob.relations:
+        obj = prob.relations[name]
+    elif name in prob.operations:
+        obj = prob.operations[name]
+    else:
+        raise ValueError(f"unknown relation or operation {name}")
+
+    prop = req["property"]
+    if not (prop.startswith("is_") or prop == "has_values") \
+            or not hasattr(obj, prop):
+        raise ValueError(f"unknown property {prop} of {name}")
+
+    args = []
+    if "with" in req:
+        if req["with"] not in prob.relations:
+            raise ValueError(f"unknown relation {req['with']}")
+        args.append(prob.relations[req["with"]])
+    if "table" in req:
+        args.append(req["table"])
+
+    formula = getattr(obj, prop)(*args)
+    return ~formula if req.get("negate", False) else formula
+
+
+@typechecked
+def build_problem(spec: Dict[str, Any]) -> Tuple[Problem, List[str]]:
+    # Returns the problem and the names to project the models to.
+    prob = Problem()
+
+    for name, size in spec.get("domains", {}).items():
+        prob.declare(FixedDom(name, size))
+
+    for kind, cls in (("relations", Relation), ("operations", Operation)):
+        for name, decl in spec.get(kind, {}).items():
+            if decl["domain"] not in prob.domains:
+                raise ValueError(f"unknown domain {decl['domain']}")
+            prob.declare(cls(name, prob.domains[decl["domain"]],
+                             decl["arity"]))
+
+    for req in spec.get("require", []):
+        prob.require(requirement(prob, req))
+
+    names = spec.get("project")
+    if names is None:
+        names = list(prob.relations) + list(prob.operations)
+    if spec.get("break_symmetries", False):
+        # the permutations of the domain must be symmetries of the problem
+        if any(req.get("property") == "has_values"
+               for req in spec.get("require", [])):
+            raise ValueError("break_symmetries cannot be used with has_values")
+        hidden = [name for name in list(prob.relations)
+                  + list(prob.operations) if name not in names]
+        if hidden:
+            raise ValueError("break_symmetries needs every relation and "
+                             f"operation projected, not {', '.join(hidden)}")
+        prob.break_symmetries(names)
+    return prob, names
+
+
+@click.command("enumerate")
+@click.argument("spec", type=click.Path(exists=True, dir_okay=False))
+@click.option("--jobs", type=int, default=1,
+              help="Number of parallel solver calls, 0 for all cores.")
+@click.option("--backend", type=click.Choice(Problem.BACKENDS),
+              default="vampire", help="Model finder to use.")
+@click.option("--blocking", type=click.Choice(Problem.BLOCKINGS),
+              default="clause", help="Encoding of the found models.")
+@click.option("--limit", type=int,
+              help="Stop after this many models.")
+@click.option("--count-only", is_flag=True,
+              help="Print only the number of models.")
+@click.option("--output", type=click.Path(dir_okay=False),
+              help="Write the models here instead of the standard output.")
+@click.option("--format", "fmt", type=click.Choice(["jsonl", "archive"]),
+              default="jsonl", help="Format of the output file.")
+def enumerate_spec(spec: str, jobs: int, backend: str, blocking: str,
+                   limit: Optional[int], count_only: bool,
+                   output: Optional[str], fmt: str):
+    try:
+        prob, names = build_problem(load_spec(spec))
+    except KeyError as error:
+        raise click.BadParameter(f"missing key {error}", param_hint="SPEC")
+    except (ValueError, TypeError, AssertionError, TypeCheckError) as error:
+        raise click.BadParameter(str(error) or "invalid spec",
+                                 param_hint="SPEC")
+    models = prob.yield_all_models(names, jobs=jobs, backend=backend,
+                                   blocking=blocking)
+    if limit is not None:
+        models = itertools.islice(models, limit)
+
+    count = 0
+    if count_only:
+        for _ in models:
+            count += 1
+    elif fmt == "archive":
+        if output is None:
+            raise click.UsageError("the archive format needs --output")
+        # numpy is optional, so it is imported only for archives
+        try:
+            from .archive import ArchiveWriter
+        except ImportError:
+            raise click.UsageError("the archive format needs numpy")
+        with ArchiveWriter(output, prob, names) as writer:
+            count = writer.write_all(models)
+    else:
+        file = sys.stdout if output is None else open(output, "w")
+        try:
+            for model in models:
+                file.write(dump_model(model) + "\n")
+                count += 1
+        finally:
+            if output is not None:
+                file.close()
+
+    if count_only or output is not None:
+        print(count)
@@ -0,0 +1,95 @@
+# Copyright (C) 2024, Miklos Maroti
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import re
+from typing import Any, Dict, List, Optional
+from typeguard import typechecked
+
+
+class SolverStatistics:
+    """
+    Statistics printed by Vampire with the --statistics option, collected
+    from the output lines as they arrive. Every "% name: value" line is
+    kept in values with numbers converted (times are in seconds), the
+    domain sizes tried by the fmb saturation algorithm are in sizes_tried.
+    """
+
+    OPTIONS = ("--statistics", "full")
+
+    RE_VALUE = re.compile(r"^% ([A-Za-z][^:]*): (.*)$")
+    RE_TRYING = re.compile(r"^TRYING \[([\d,\s]*)\]")
+
+    @typechecked
+    def __init__(self):
+        self.values: Dict[str, int | float | str] = {}
+        self.sizes_tried: List[List[int]] = []
+
+    @staticmethod
+    def convert(text: str) -> int | float | str:
+        text = text.strip()
+        if text.endswith(" s"):
+            text = text[:-2]
+        for kind in (int, float):
+            try:
+                return kind(text)
+            except ValueError:
+                pass
+        return text
+
+    def feed(self, line: str):
+        if line.startswith("%"):
+            match = SolverStatistics.RE_VALUE.match(line.rstrip())
+            if match:
+                self.values[match.group(1).strip()] = \
+                    SolverStatistics.convert(match.group(2))
+        elif line.startswith("TRYING"):
+            match = SolverStatistics.RE_TRYING.match(line)
+            if match:
+                self.sizes_tried.append(
+                    [int(s) for s in match.group(1).split(",") if s.strip()])
+
+    @typechecked
+    def as_dict(self) -> Dict[str, Any]:
+        return {"values": self.values, "sizes_tried": self.sizes_tried}
+
+    @staticmethod
+    @typechecked
+    def from_dict(data: Dict[str, Any]) -> 'SolverStatistics':
+        stats = SolverStatistics()
+        stats.values = dict(data["values"])
+        stats.sizes_tried = [list(sizes) for sizes in data["sizes_tried"]]
+        return stats
+
+    @property
+    def termination_reason(self) -> Optional[str]:
+        value = self.values.get("Termination reason")
+        return None if value is None else str(value)
+
+    @property
+    def time_elapsed(self) -> Optional[float]:
+        value = self.values.get("Time elapsed")
+        return None if isinstance(value, str) else value
+
+    @property
+    def memory_used(self) -> Optional[int]:
+        # in bytes
+        value = self.values.get("Memory used [KB]")
+        return value * 1024 if isinstance(value, int) else None
+
+    @property
+    def wasted_sizes(self) -> List[List[int]]:
+        # the sizes tried before the last one, when the domains are fixed
+        # these are all too small
+        return self.sizes_tried[:-1]
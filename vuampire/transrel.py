@@ -17,14 +17,25 @@ from .domain import FixedDom, UNIVERSE
 from .relation import Relation
 from .operation import Operation
 from .problem import Problem
-from .formula import logical_not
+from .bitrel import digraph_batches, transitive_rows, unpack_tables
+from . import generators
 
-from typing import List, Iterator
+from typing import List, Iterator, Optional
 
 
 def quasi_orders(dom_size: int) -> Iterator[List[bool]]:
     assert dom_size >= 0
+    return generators.quasi_orders(dom_size)
 
+
+def reflexive_digraphs(dom_size: int) -> Iterator[List[bool]]:
+    assert dom_size >= 0
+    for rows in digraph_batches(dom_size):
+        for table in unpack_tables(dom_size, rows):
+            yield table.tolist()
+
+
+def test1_problem(dom_size: int, table: List[bool]) -> Problem:
     prob = Problem()
 
     dom = FixedDom("dom", dom_size)
@@ -33,100 +44,39 @@ def quasi_orders(dom_size: int) -> Iterator[List[bool]]:
     rel = Relation("rel", dom, 2)
     prob.declare(rel)
 
-    prob.require(rel.is_reflexive())
-    prob.require(rel.is_transitive())
-
-    for result in prob.yield_all_models([rel.name]):
-        yield result[rel.name]
+    prob.require(rel.has_values(table))
+    return prob
 
 
-def reflexive_digraphs(dom_size: int) -> Iterator[List[bool]]:
-    assert dom_size >= 0
-
-    table = [False] * (dom_size * dom_size)
-    for i in range(dom_size):
-        table[i * (dom_size + 1)] = True
-
-    def next() -> bool:
-        for i in range(dom_size):
-            for j in range(dom_size):
-                if j == i:
-                    continue
-                k = i * dom_size + j
-                if table[k]:
-                    table[k] = False
-                else:
-                    table[k] = True
-                    return True
-        return False
-
-    while True:
-        yield table
-        if not next():
-            break
-
-
-def advance(dom_size: int, table: List[bool]) -> bool:
-    for i in range(dom_size):
-        for j in range(dom_size):
-            if j == i:
-                continue
-
-            k = i * dom_size + j
-            if table[k]:
-                table[k] = False
-            else:
-                table[k] = True
-                return True
-
-    return False
-
-
-def test1():
+def test1(jobs: Optional[int] = None):
     dom_size = 4
 
-    table = [False] * (dom_size ** 2)
-    for i in range(dom_size):
-        table[i * (dom_size + 1)] = True
-
-    while True:
-        prob = Problem()
-
-        dom = FixedDom("dom", dom_size)
-        prob.declare(dom)
-
-        rel = Relation("rel", dom, 2)
-        prob.declare(rel)
+    # the digraphs are ground, so transitivity is checked in batches
+    tables = []
+    for rows in digraph_batches(dom_size):
+        rows = rows[~transitive_rows(dom_size, rows)]
+        tables.extend(table.tolist()
+                      for table in unpack_tables(dom_size, rows))
 
-        prob.require(rel.has_values(table))
-        prob.require(logical_not(rel.is_transitive()))
+    probs = []
+    for table in tables:
+        prob = test1_problem(dom_size, table)
+        dom = prob.domains["dom"]
+        rel = prob.relations["rel"]
 
-        print()
-        prob.print()
-        solution = prob.find_one_model()
-        print(solution, table)
-        if solution is None:
-            if advance(dom_size, table):
-                continue
-            else:
-                break
-
-        print("hihi")
         op = Operation("op", dom, 2)
         prob.declare(op)
-        prob.require(logical_not(op.is_compatible_with(rel)))
+        prob.require(~op.is_compatible_with(rel))
 
-        prob.require(
-            "(![A:dom, B0:dom, B1:dom]: (rel(B0,B1) => rel(op(A,B0),op(A,B1))))")
-        prob.require(
-            "(![A:dom, B0:dom, B1:dom]: (rel(B0,B1) => rel(op(B0,A),op(B1,A))))")
+        prob.require(dom.forall(lambda a, b0, b1: rel(b0, b1).imp(
+            rel(op(a, b0), op(a, b1)))))
+        prob.require(dom.forall(lambda a, b0, b1: rel(b0, b1).imp(
+            rel(op(b0, a), op(b1, a)))))
+        probs.append(prob)
 
-        solution = prob.find_one_model()
+    for idx, solution in Problem.find_one_model_many(probs, jobs=jobs):
         if solution is None:
-            print(table)
-
-        if not advance(dom_size, table):
-            break
+            print(tables[idx])
 
 
 def transrel():
@@ -13,16 +13,39 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import asyncio
 import click
-
+from concurrent.futures import ThreadPoolExecutor
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from typing import List, Optional
+
+from .cache import SolverCache
+from .canonical import unique_models
+from .limits import Budget
+from .model import dump_model
+from .checkpoint import Checkpoint, checkpointed_models
+from .observer import Collector, JsonLinesExporter
+from .portfolio import Portfolio
 from .problem import Problem
-from .domain import FixedDom
+from .domain import FixedDom, Term
 from .relation import Relation
+from .statistics import SolverStatistics
 from .operation import Operation
+from . import generators
 
 
-def check_equivalence_relations(size: int, expected: int):
-    print(f"Number of {size}-element equivalence relations is: ",
+def check_equivalence_relations(size: int, expected: int, jobs: int = 1,
+                                backend: str = "vampire",
+                                blocking: str = "clause",
+                                up_to_iso: bool = False):
+    print(f"Number of {size}-element equivalence relations"
+          f"{' up to isomorphism' if up_to_iso else ''} is: ",
           end="", flush=True)
 
     prob = Problem()
@@ -35,14 +58,22 @@ def check_equivalence_relations(size: int, expected: int):
 
     prob.require(rel.is_equivalence())
 
-    count = prob.find_num_models(["rel"])
+    if up_to_iso:
+        prob.break_symmetries(["rel"])
+
+    count = prob.find_num_models(["rel"], jobs=jobs, backend=backend,
+                                 blocking=blocking)
 
     print(count)
     assert count == expected
 
 
-def check_partial_orders(size: int, expected: int):
-    print(f"Number of {size}-element partial orders is: ", end="", flush=True)
+def check_partial_orders(size: int, expected: int, jobs: int = 1,
+                         backend: str = "vampire", blocking: str = "clause",
+                         up_to_iso: bool = False):
+    print(f"Number of {size}-element partial orders"
+          f"{' up to isomorphism' if up_to_iso else ''} is: ",
+          end="", flush=True)
 
     prob = Problem()
 
@@ -54,14 +85,22 @@ def check_partial_orders(size: int, expected: int):
 
     prob.require(rel.is_partialorder())
 
-    count = prob.find_num_models(["rel"])
+    if up_to_iso:
+        prob.break_symmetries(["rel"])
+
+    count = prob.find_num_models(["rel"], jobs=jobs, backend=backend,
+                                 blocking=blocking)
 
     print(count)
     assert count == expected
 
 
-def check_semigroups(size: int, expected: int):
-    print(f"Number of {size}-element semigroups is: ", end="", flush=True)
+def check_semigroups(size: int, expected: int, jobs: int = 1,
+                     backend: str = "vampire", blocking: str = "clause",
+                     up_to_iso: bool = False):
+    print(f"Number of {size}-element semigroups"
+          f"{' up to isomorphism' if up_to_iso else ''} is: ",
+          end="", flush=True)
 
     prob = Problem()
 
@@ -73,14 +112,22 @@ def check_semigroups(size: int, expected: int):
 
     prob.require(op.is_associative())
 
-    count = prob.find_num_models(["op"])
+    if up_to_iso:
+        prob.break_symmetries(["op"])
+
+    count = prob.find_num_models(["op"], jobs=jobs, backend=backend,
+                                 blocking=blocking)
 
     print(count)
     assert count == expected
 
 
-def check_semilattices(size: int, expected: int):
-    print(f"Number of {size}-element semilattices is: ", end="", flush=True)
+def check_semilattices(size: int, expected: int, jobs: int = 1,
+                       backend: str = "vampire", blocking: str = "clause",
+                       up_to_iso: bool = False):
+    print(f"Number of {size}-element semilattices"
+          f"{' up to isomorphism' if up_to_iso else ''} is: ",
+          end="", flush=True)
 
     prob = Problem()
 
@@ -94,13 +141,19 @@ def check_semilattices(size: int, expected: int):
     prob.require(op.is_commutative())
     prob.require(op.is_associative())
 
-    count = prob.find_num_models(["op"])
+    if up_to_iso:
+        prob.break_symmetries(["op"])
+
+    count = prob.find_num_models(["op"], jobs=jobs, backend=backend,
+                                 blocking=blocking)
 
     print(count)
     assert count == expected
 
 
-def check_petersen_automorphisms():
+def check_petersen_automorphisms(jobs: int = 1,
+                                 backend: str = "vampire",
+                                 blocking: str = "clause"):
     print(f"Number of automorphisms of the Petersen graph is: ",
           end="", flush=True)
 
@@ -132,16 +185,586 @@ def check_petersen_automorphisms():
     prob.require(aut.is_bijective())
     prob.require(aut.is_compatible_with(rel))
 
-    count = prob.find_num_models(["aut"])
+    count = prob.find_num_models(["aut"], jobs=jobs, backend=backend,
+                                 blocking=blocking)
 
     print(count)
     assert count == 120
 
 
+def check_element_tables(backend: str = "vampire",
+                         blocking: str = "clause"):
+    print("Number of unary operations given by element tables is: ",
+          end="", flush=True)
+
+    prob = Problem()
+
+    dom = FixedDom("dom", 3)
+    prob.declare(dom)
+
+    op = Operation("op", dom, 1)
+    prob.declare(op)
+
+    elems = dom.elems
+    assert op.has_values([elems[1], elems[2], elems[0]]) is \
+        op.has_values([1, 2, 0])
+    prob.require(op.has_values([elems[1], None, elems[0]]))
+
+    count = prob.find_num_models(["op"], backend=backend,
+                                 blocking=blocking)
+
+    print(count)
+    assert count == 3
+
+
+def check_generators():
+    print("Number of 4-element quasi-orders from generators is: ",
+          end="", flush=True)
+
+    counts = [
+        sum(1 for _ in generators.reflexive_relations(3)),
+        sum(1 for _ in generators.reflexive_relations(3, up_to_iso=True)),
+        sum(1 for _ in generators.quasi_orders(4)),
+        sum(1 for _ in generators.quasi_orders(4, up_to_iso=True)),
+        sum(1 for _ in generators.partial_orders(4)),
+        sum(1 for _ in generators.partial_orders(4, up_to_iso=True)),
+        sum(1 for _ in generators.equivalences(5)),
+        sum(1 for _ in generators.equivalences(5, up_to_iso=True)),
+    ]
+
+    print(counts[2])
+    assert counts == [64, 16, 355, 33, 219, 16, 52, 7]
+
+
+def check_unique_models(backend: str = "vampire", blocking: str = "clause"):
+    print("Number of 3-element partial orders after deduplication is: ",
+          end="", flush=True)
+
+    prob = Problem()
+
+    dom = FixedDom("dom", 3)
+    prob.declare(dom)
+
+    rel = Relation("rel", dom, 2)
+    prob.declare(rel)
+
+    prob.require(rel.is_partialorder())
+
+    models = prob.find_all_models(["rel"], backend=backend,
+                                  blocking=blocking)
+    count = sum(1 for _ in unique_models(models, 3))
+
+    print(count)
+    assert len(models) == 19 and count == 5
+
+
+def check_observers(backend: str = "vampire", blocking: str = "clause"):
+    print("Number of 3-element equivalence relations observed is: ",
+          end="", flush=True)
+
+    prob = Problem()
+
+    dom = FixedDom("dom", 3)
+    prob.declare(dom)
+
+    rel = Relation("rel", dom, 2)
+    prob.declare(rel)
+
+    prob.require(rel.is_equivalence())
+
+    collector = Collector()
+    Problem.observers.append(collector)
+    try:
+        count = prob.find_num_models(["rel"], backend=backend,
+                                     blocking=blocking)
+    finally:
+        Problem.observers.remove(collector)
+
+    # the in-process finder of the clause blocking makes no solver calls
+    summary = collector.summary()
+    assert summary["solver_calls"] in (0, summary["models_found"] + 1)
+    assert len(collector.enumerations) == 1
+    observed = collector.enumerations[0].models
+
+    print(observed)
+    assert count == observed == 5
+
+
+def check_portfolio():
+    print("Number of portfolio wins recorded is: ", end="", flush=True)
+
+    prob = Problem()
+
+    dom = FixedDom("dom", 2)
+    prob.declare(dom)
+
+    op = Operation("op", dom, 2)
+    prob.declare(op)
+
+    prob.require(op.is_associative())
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "wins.json")
+        result, strategy = Portfolio(path=path).find_one_model(
+            prob, family="semigroups")
+        assert result is not None
+
+        portfolio = Portfolio(path=path)
+        assert portfolio.ranked("semigroups")[0] == strategy
+        wins = portfolio.wins["semigroups"]
+
+    print(sum(wins.values()))
+    assert wins == {" ".join(strategy): 1}
+
+
+def check_array_models(backend: str = "vampire", blocking: str = "clause"):
+    print("Number of 2-element semigroups checked by arrays is: ",
+          end="", flush=True)
+
+    # numpy is optional, so it is imported only for this check
+    from .arrays import ArrayModel
+
+    prob = Problem()
+
+    dom = FixedDom("dom", 2)
+    prob.declare(dom)
+
+    op = Operation("op", dom, 2)
+    prob.declare(op)
+
+    models = prob.find_all_models(["op"], backend=backend, blocking=blocking)
+    selected = {tuple(m["op"]) for m in models
+                if ArrayModel(prob, m).check(op.is_associative())}
+
+    prob = Problem()
+    prob.declare(dom)
+    prob.declare(op)
+    prob.require(op.is_associative())
+
+    expected = {tuple(m["op"]) for m in prob.find_all_models(
+        ["op"], backend=backend, blocking=blocking)}
+
+    print(len(selected))
+    assert len(models) == 16 and selected == expected and len(selected) == 8
+
+
+def check_bit_relations():
+    print("Number of transitive relations on 3 elements from bits is: ",
+          end="", flush=True)
+
+    # numpy is optional, so it is imported only for this check
+    import numpy as np
+    from .bitrel import BitRelation, pack_tables, unpack_tables, \
+        compose_rows, transpose_rows, transitive_rows, digraph_batches
+
+    size = 3
+    pairs = [(i, j) for i in range(size) for j in range(size)]
+
+    def compose(table1: List[bool], table2: List[bool]) -> List[bool]:
+        return [any(table1[i * size + k] and table2[k * size + j]
+                    for k in range(size)) for i, j in pairs]
+
+    def transpose(table: List[bool]) -> List[bool]:
+        return [table[j * size + i] for i, j in pairs]
+
+    rows = np.concatenate(list(digraph_batches(size, reflexive=False)))
+    tables = unpack_tables(size, rows).tolist()
+    assert len(tables) == 1 << size * size
+    assert np.array_equal(pack_tables(size, tables), rows)
+
+    others = tables[::-1]
+    composed = unpack_tables(size, compose_rows(
+        size, rows, pack_tables(size, others))).tolist()
+    transposed = unpack_tables(size, transpose_rows(size, rows)).tolist()
+    transitive = transitive_rows(size, rows).tolist()
+
+    count = 0
+    for idx, table in enumerate(tables):
+        rel = BitRelation.from_table(size, table)
+        other = BitRelation.from_table(size, others[idx])
+        assert rel.table() == table
+        assert all(((i, j) in rel) == table[i * size + j] for i, j in pairs)
+
+        product = compose(table, others[idx])
+        assert rel.compose(other).table() == product == composed[idx]
+        assert rel.transpose().table() == transpose(table) == transposed[idx]
+        assert (rel & other).table() == [
+            a and b for a, b in zip(table, others[idx])]
+        assert (rel | other).table() == [
+            a or b for a, b in zip(table, others[idx])]
+        assert (rel <= other) == all(
+            b or not a for a, b in zip(table, others[idx]))
+
+        assert rel.is_reflexive() == all(
+            table[i * size + i] for i in range(size))
+        assert rel.is_symmetric() == (table == transpose(table))
+        assert rel.is_antisymmetric() == all(
+            not (table[i * size + j] and table[j * size + i])
+            for i, j in pairs if i != j)
+
+        closed = all(b or not a
+                     for a, b in zip(compose(table, table), table))
+        assert rel.is_transitive() == closed == transitive[idx]
+        count += closed
+
+    print(count)
+    assert count == 171
+
+
+def check_archive(backend: str = "vampire", blocking: str = "clause"):
+    print("Number of 3-element semilattices read from an archive is: ",
+          end="", flush=True)
+
+    # numpy is optional, so it is imported only for this check
+    import numpy as np
+    from .archive import MAGIC, Archive, ArchiveWriter, archive_all_models
+
+    prob = Problem()
+
+    dom = FixedDom("dom", 3)
+    prob.declare(dom)
+
+    op = Operation("op", dom, 2)
+    prob.declare(op)
+
+    rel = Relation("rel", dom, 2)
+    prob.declare(rel)
+
+    prob.require(op.is_idempotent())
+    prob.require(op.is_commutative())
+    prob.require(op.is_associative())
+    prob.require(dom.forall(lambda x, y: rel(x, y).iff(op(x, y) == x)))
+
+    names = ["op", "rel"]
+    copy = prob.copy()
+    models = prob.find_all_models(names, backend=backend, blocking=blocking)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "models.arc")
+        with ArchiveWriter(path, prob, names, flush_size=64) as writer:
+            assert writer.write_all(models) == len(models)
+
+        # a partially written last row is ignored
+        with open(path, "ab") as file:
+            file.write(bytes(5))
+
+        archive = Archive(path)
+        assert archive.names == names and len(archive) == len(models)
+        assert [archive.model(idx) for idx in range(len(archive))] == models
+
+        ops = archive.table("op")
+        rels = archive.table("rel")
+        assert ops.shape == rels.shape == (len(models), 3, 3)
+        assert rels.dtype == bool
+        assert np.array_equal(rels, ops == np.arange(3)[:, None])
+        assert archive.table("op", 0).tolist() == \
+            np.reshape(models[0]["op"], (3, 3)).tolist()
+        count = len(archive)
+        del ops, rels, archive
+
+        other = os.path.join(tmpdir, "other.arc")
+        assert archive_all_models(copy, other, names, backend=backend,
+                                  blocking=blocking) == count
+        with open(other, "rb") as file:
+            assert file.read(len(MAGIC)) == MAGIC
+
+    print(count)
+    assert count == 9
+
+
+def partial_orders_problem(size: int) -> Problem:
+    prob = Problem()
+
+    dom = FixedDom("dom", size)
+    prob.declare(dom)
+
+    rel = Relation("rel", dom, 2)
+    prob.declare(rel)
+
+    prob.require(rel.is_partialorder())
+    return prob
+
+
+def check_checkpoint(backend: str = "vampire", blocking: str = "clause"):
+    print("Number of 3-element partial orders after resuming is: ",
+          end="", flush=True)
+
+    options = {"backend": backend, "blocking": blocking}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "orders.json")
+        models = checkpointed_models(partial_orders_problem(3), ["rel"],
+                                     path, interval=0.0, **options)
+        found = [next(models) for _ in range(7)]
+        models.close()
+
+        checkpoint = Checkpoint(path)
+        header = checkpoint.header()
+        assert header["models"] == 7 and not header["complete"]
+        assert checkpoint.models() == found
+
+        # simulate a crash in the middle of writing the last model
+        with open(checkpoint.log_path, "r+b") as file:
+            file.truncate(file.seek(0, os.SEEK_END) - 3)
+        assert checkpoint.models() == found[:6]
+
+        found = found[:6] + list(checkpointed_models(
+            partial_orders_problem(3), ["rel"], path, **options))
+        header = checkpoint.header()
+        assert header["complete"] and header["models"] == len(found)
+        assert checkpoint.models() == found
+
+        assert not list(checkpointed_models(
+            partial_orders_problem(3), ["rel"], path, **options))
+
+    count = len({tuple(model["rel"]) for model in found})
+    print(count)
+    assert count == len(found) == 19
+
+
+def check_trie_blocking(backend: str = "vampire"):
+    print("Number of 3-element semigroups blocked by a smaller trie is: ",
+          end="", flush=True)
+
+    prob = Problem()
+
+    dom = FixedDom("dom", 3)
+    prob.declare(dom)
+
+    op = Operation("op", dom, 2)
+    prob.declare(op)
+
+    prob.require(op.is_associative())
+
+    flat = prob.copy()
+    size = len(prob.data)
+    models = prob.find_all_models(["op"], backend=backend, blocking="trie")
+    trie_bytes = len(prob.data) - size
+
+    # the axioms the clause blocking would add for the same models
+    size = len(flat.data)
+    for model in models:
+        flat.require(~Term.all([flat.has_values("op", model["op"])]))
+    flat_bytes = len(flat.data) - size
+
+    print(len(models))
+    assert len(models) == 113 and trie_bytes < flat_bytes
+
+
+def check_budgets():
+    print("Number of budgets that stopped the native backend is: ",
+          end="", flush=True)
+
+    # budgets with the delay after which they are cancelled
+    budgets = [(Budget(wall_time=0.2), None), (Budget(cpu_time=0.2), None),
+               (Budget(), 0.2)]
+
+    stopped = 0
+    for budget, delay in budgets:
+        prob = Problem()
+
+        dom = FixedDom("dom", 4)
+        prob.declare(dom)
+
+        op = Operation("op", dom, 2)
+        prob.declare(op)
+
+        prob.require(op.is_associative())
+
+        start = time.monotonic()
+        if delay is not None:
+            threading.Timer(delay, budget.cancel).start()
+        count = sum(1 for _ in prob.yield_all_models(
+            ["op"], backend="native", budget=budget))
+        assert count < 3492 and time.monotonic() - start < 5.0
+        assert budget.exhausted
+        stopped += 1
+
+    assert budgets[1][0].cpu_used >= 0.2
+
+    print(stopped)
+    assert stopped == 3
+
+
+def check_model_dump(backend: str = "vampire"):
+    print("Number of solver statistics values after a round trip is: ",
+          end="", flush=True)
+
+    prob = Problem()
+
+    dom = FixedDom("dom", 3)
+    prob.declare(dom)
+
+    op = Operation("op", dom, 2)
+    prob.declare(op)
+
+    prob.require(op.is_associative())
+
+    model = prob.find_one_model(backend=backend,
+                                statistics=backend == "vampire")
+    assert model is not None
+    if "statistics" not in model:
+        stats = SolverStatistics()
+        for line in ["TRYING [3]", "% Termination reason: Satisfiable",
+                     "% Time elapsed: 0.012 s"]:
+            stats.feed(line)
+        model["statistics"] = stats
+
+    loaded = json.loads(dump_model(model))
+    stats = SolverStatistics.from_dict(loaded.pop("statistics"))
+    assert stats.values == model["statistics"].values
+    assert stats.sizes_tried == model["statistics"].sizes_tried
+    assert loaded == json.loads(json.dumps(
+        {key: value for key, value in model.items() if key != "statistics"}))
+
+    print(len(stats.values))
+    assert len(stats.values) >= 2
+
+
+def check_parallel_problems(jobs: int = 1, backend: str = "vampire"):
+    print("Number of problems solved in parallel is: ", end="", flush=True)
+
+    probs = []
+    for size in range(1, 5):
+        prob = Problem()
+
+        dom = FixedDom("dom", size)
+        prob.declare(dom)
+
+        rel = Relation("rel", dom, 2)
+        prob.declare(rel)
+
+        # only the 1-element problem has no model
+        prob.require(rel.is_reflexive())
+        prob.require(dom.exists(lambda x, y: ~rel(x, y)))
+        probs.append(prob)
+
+    ordered = list(Problem.find_one_model_many(
+        probs, jobs=max(jobs, 2), backend=backend))
+    assert [idx for idx, _ in ordered] == list(range(len(probs)))
+    assert [result is None for _, result in ordered] == \
+        [True, False, False, False]
+
+    unordered = list(Problem.find_one_model_many(
+        probs, jobs=max(jobs, 2), ordered=False, backend=backend))
+    assert sorted(idx for idx, _ in unordered) == list(range(len(probs)))
+
+    print(len(ordered))
+    assert len(ordered) == len(unordered) == 4
+
+
+def check_async(backend: str = "vampire"):
+    print("Number of 3-element partial orders found asynchronously is: ",
+          end="", flush=True)
+
+    async def run():
+        limiter = asyncio.Semaphore(2)
+        models = [model async for model in partial_orders_problem(
+            3).yield_all_models_async(["rel"], backend=backend,
+                                      limiter=limiter)]
+        results = await asyncio.gather(*(
+            partial_orders_problem(size).find_one_model_async(
+                backend=backend, limiter=limiter)
+            for size in range(1, 5)))
+        return models, results
+
+    models, results = asyncio.run(run())
+    assert all(result is not None for result in results)
+    count = len({tuple(model["rel"]) for model in models})
+
+    print(count)
+    assert count == len(models) == 19
+
+
+def build_formulas(size: int) -> List[str]:
+    dom = FixedDom("dom", size)
+    rel = Relation("rel", dom, 3)
+    op1 = Operation("op1", dom, 1)
+    op2 = Operation("op2", dom, 2)
+
+    return [str(t) for t in [
+        rel.is_reflexive(),
+        op1.is_surjective(),
+        op2.is_associative(),
+        op2.is_compatible_with(rel),
+        dom.forall(lambda x: op1.is_compatible_with(rel) & dom.exists(
+            lambda y: op2(x, y) == op1(y))),
+    ]]
+
+
+def check_concurrent_construction(count: int, jobs: int = 16):
+    print("Number of formula sets built concurrently is: ",
+          end="", flush=True)
+
+    expected = [build_formulas(size) for size in range(1, 5)]
+
+    # switch threads often to provoke interleavings
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            results = list(executor.map(
+                lambda idx: build_formulas(1 + idx % 4), range(count)))
+    finally:
+        sys.setswitchinterval(interval)
+
+    for idx, result in enumerate(results):
+        assert result == expected[idx % 4]
+
+    print(len(results))
+    assert len(results) == count
+
+
 @click.command()
-def validate():
-    check_equivalence_relations(5, 52)
-    check_partial_orders(3, 19)
-    check_semigroups(3, 113)
-    check_semilattices(4, 76)
-    check_petersen_automorphisms()
+@click.option("--jobs", type=int, default=1,
+              help="Number of parallel solver calls, 0 for all cores.")
+@click.option("--backend", type=click.Choice(Problem.BACKENDS),
+              default="vampire", help="Model finder to use.")
+@click.option("--cache", type=click.Path(dir_okay=False),
+              help="Sqlite database for caching solver results.")
+@click.option("--blocking", type=click.Choice(Problem.BLOCKINGS),
+              default="clause", help="Encoding of the found models.")
+@click.option("--events", type=click.Path(dir_okay=False),
+              help="Append the solver call events to this JSON lines file.")
+def validate(jobs: int, backend: str, blocking: str, cache: Optional[str],
+             events: Optional[str]):
+    if cache is not None:
+        Problem.default_cache = SolverCache(cache)
+    if events is not None:
+        exporter = JsonLinesExporter(events)
+        Problem.observers.append(exporter)
+
+    options = {"jobs": jobs, "backend": backend, "blocking": blocking}
+    check_equivalence_relations(5, 52, **options)
+    check_partial_orders(3, 19, **options)
+    check_semigroups(3, 113, **options)
+    check_semilattices(4, 76, **options)
+    check_petersen_automorphisms(**options)
+    check_equivalence_relations(5, 7, up_to_iso=True, **options)
+    check_partial_orders(3, 5, up_to_iso=True, **options)
+    check_semigroups(3, 24, up_to_iso=True, **options)
+    check_semilattices(4, 5, up_to_iso=True, **options)
+    check_element_tables(backend=backend, blocking=blocking)
+    check_generators()
+    check_unique_models(backend=backend, blocking=blocking)
+    check_observers(backend=backend, blocking=blocking)
+    if backend == "vampire":
+        check_portfolio()
+    check_checkpoint(backend=backend, blocking=blocking)
+    check_trie_blocking(backend=backend)
+    check_budgets()
+    check_model_dump(backend=backend)
+    check_parallel_problems(jobs=jobs, backend=backend)
+    check_async(backend=backend)
+    if importlib.util.find_spec("numpy") is None:
+        print("Skipping the numpy checks, numpy is not installed")
+    else:
+        check_array_models(backend=backend, blocking=blocking)
+        check_bit_relations()
+        check_archive(backend=backend, blocking=blocking)
+    check_concurrent_construction(64)
+
+    if cache is not None:
+        print("Solver cache statistics:", Problem.default_cache.stats())
+    if events is not None:
+        Problem.observers.remove(exporter)
+        exporter.close()